@@ -0,0 +1,250 @@
+import csv
+import argparse
+from functools import lru_cache
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from results_store import BINARY_RESULTS_SUFFIX, BlockResults
+from config import RESAMPLED_SUFFIX, RAW_CAPTURE_SUFFIX
+
+ANALYSIS_RATE = 200                 # Hz, trajectories are resampled to this rate
+PSD_BAND = (0.5, 20)                # Hz, band of the power spectrum slope fit
+DFA_MIN_SCALE = 4                   # samples
+DFA_NUM_SCALES = 8
+CHUNK_SIZE = 200                    # trials per worker task
+TRIAL_SOURCES = {                   # files the samples of a trial CSV file are read from, by source
+    'trial': None,                  # the trial file, one sample per sampler tick
+    'resampled': RESAMPLED_SUFFIX,  # the tablet events resampled at the trial rate
+    'raw': RAW_CAPTURE_SUFFIX,      # every tablet event
+}
+
+SUMMARY_FIELDS = (
+    'duration_ms', 'path_length_mm', 'mean_speed', 'peak_speed', 'rms_jerk', 'normalized_jerk',
+    'psd_slope_y', 'psd_slope_speed', 'dfa_alpha_y', 'dfa_alpha_speed'
+)
+
+
+def read_trial(path: Path, source: str = 'trial') -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Reads the x, y (mm) and time (ms) of the samples of a trial until it ended, from a trial CSV
+    file or from a `<results file>#<index>` reference to a trial in a binary block results file.
+
+    Args:
+        path (Path): The trial CSV file or binary results reference.
+        source (str): One of `TRIAL_SOURCES`. 'resampled' and 'raw' read the samples of a trial
+            CSV file from its `.resampled.csv` or `.raw.csv` file instead, which are timed by the
+            tablet's hardware timestamps rather than held at each sampler tick.
+
+    Raises:
+        ValueError: If `source` is unknown, or is not 'trial' for a binary results reference.
+        FileNotFoundError: If the trial has no file for `source`.
+    """
+    if source not in TRIAL_SOURCES:
+        raise ValueError(f"Unknown trial source: {source}")
+    path = str(path)
+    if '#' in path:
+        if source != 'trial':
+            raise ValueError(f"Binary results have no {source} samples: {path}")
+        results_path, index = path.rsplit('#', 1)
+        block = _load_block(results_path)
+        samples = block.trial_samples(int(index))
+        x, y, t = samples['x'], samples['y'], samples['time']
+        total_time = block.trials['total_time'][int(index)]
+    else:
+        with open(path, newline="") as file:
+            reader = csv.reader(file)
+            header = next(reader)
+            total_time = float(next(reader)[header.index('total_time')])
+        if TRIAL_SOURCES[source] is not None:
+            path = Path(path).with_suffix(TRIAL_SOURCES[source])
+        x, y, t = np.loadtxt(path, delimiter=',', skiprows=1, usecols=(0, 1, 7), ndmin=2).T
+    # Leave out the additional points recorded after the end of the test
+    end = np.searchsorted(t, total_time, side='right')
+    return x[:end], y[:end], t[:end]
+
+
+@lru_cache(maxsize=4)
+def _load_block(path: str) -> BlockResults:
+    return BlockResults(path)
+
+
+def resample(x: np.ndarray, y: np.ndarray, t: np.ndarray, rate: float = ANALYSIS_RATE) -> tuple[np.ndarray, np.ndarray]:
+    """Interpolates a trajectory onto a uniform time grid of `rate` Hz."""
+    grid = np.arange(t[0], t[-1], 1000 / rate)
+    return np.interp(grid, t, x), np.interp(grid, t, y)
+
+
+def _detrend(signal: np.ndarray) -> np.ndarray:
+    n = np.arange(len(signal))
+    return signal - np.polyval(np.polyfit(n, signal, 1), n)
+
+
+def psd_slopes(signals: list[np.ndarray], rate: float = ANALYSIS_RATE, band: tuple[float, float] = PSD_BAND) -> np.ndarray:
+    """
+    Returns the log-log slope of the power spectrum of each signal, fitted over `band`.
+
+    All signals are detrended, zero-padded to a common length and transformed with a single
+    batched FFT. The fit of each signal is limited to frequencies above one over its duration.
+    """
+    if not signals:
+        return np.empty(0)
+    lengths = np.array([len(signal) for signal in signals])
+    nfft = 1 << int(np.ceil(np.log2(max(lengths.max(), 2))))
+    batch = np.zeros((len(signals), nfft))
+    for row, signal in zip(batch, signals):
+        if np.ptp(signal) > 0:          # a constant signal has no spectrum to fit
+            row[:len(signal)] = _detrend(signal)
+    power = np.abs(np.fft.rfft(batch, axis=-1)) ** 2 / lengths[:, None]
+    frequencies = np.fft.rfftfreq(nfft, d=1 / rate)
+
+    weights = (frequencies >= band[0]) & (frequencies <= band[1]) & (frequencies >= rate / lengths[:, None]) & (power > 0)
+    log_f = np.log(np.where(frequencies > 0, frequencies, 1))
+    log_p = np.log(np.where(power > 0, power, 1))
+    # Weighted least squares of log power on log frequency, for every row at once
+    n = weights.sum(axis=-1)
+    sum_x = (weights * log_f).sum(axis=-1)
+    sum_y = (weights * log_p).sum(axis=-1)
+    sum_xx = (weights * log_f ** 2).sum(axis=-1)
+    sum_xy = (weights * log_f * log_p).sum(axis=-1)
+    denominator = n * sum_xx - sum_x ** 2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where((n >= 3) & (denominator > 0), (n * sum_xy - sum_x * sum_y) / denominator, np.nan)
+
+
+def dfa_alpha(signal: np.ndarray, num_scales: int = DFA_NUM_SCALES) -> float:
+    """Returns the detrended fluctuation analysis scaling exponent of a signal, with linear detrending in each window."""
+    n = len(signal)
+    max_scale = n // 4
+    if max_scale <= DFA_MIN_SCALE:
+        return float('nan')
+    profile = np.cumsum(signal - signal.mean())
+    scales = np.unique(np.geomspace(DFA_MIN_SCALE, max_scale, num_scales).astype(int))
+    fluctuations = []
+    for scale in scales:
+        windows = profile[:n // scale * scale].reshape(-1, scale)
+        # Linear fit of every window at once
+        k = np.arange(scale) - (scale - 1) / 2
+        slopes = windows @ k / (k @ k)
+        residuals = windows - windows.mean(axis=-1, keepdims=True) - slopes[:, None] * k
+        fluctuations.append(np.sqrt(np.mean(residuals ** 2)))
+    fluctuations = np.array(fluctuations)
+    if (fluctuations <= 0).any():
+        return float('nan')
+    return float(np.polyfit(np.log(scales), np.log(fluctuations), 1)[0])
+
+
+def kinematics(x: np.ndarray, y: np.ndarray, rate: float = ANALYSIS_RATE) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the speed (mm/s) and jerk magnitude (mm/s^3) profiles of a uniformly sampled trajectory."""
+    dt = 1 / rate
+    vx, vy = np.gradient(x, dt), np.gradient(y, dt)
+    jx = np.gradient(np.gradient(vx, dt), dt)
+    jy = np.gradient(np.gradient(vy, dt), dt)
+    return np.hypot(vx, vy), np.hypot(jx, jy)
+
+
+def analyze_trials(paths: list[str], rate: float = ANALYSIS_RATE, source: str = 'trial') -> tuple[list[dict], list[tuple[np.ndarray, np.ndarray]]]:
+    """
+    Analyzes a batch of trials, reading their samples from `source` (see `read_trial`).
+
+    Returns:
+        tuple[list[dict], list[tuple[np.ndarray, np.ndarray]]]: The summary of each trial, and
+        its speed and jerk profiles.
+    """
+    summaries, profiles, analyzed, ys, speeds = [], [], [], [], []
+    for path in paths:
+        x, y, t = read_trial(path, source)
+        summary = dict.fromkeys(SUMMARY_FIELDS, float('nan'))
+        summary['path'] = str(path)
+        summaries.append(summary)
+        if len(t) < 2:
+            profiles.append((np.empty(0), np.empty(0)))
+            continue
+        x, y = resample(x, y, t, rate)
+        speed, jerk = kinematics(x, y, rate) if len(x) >= 3 else (np.zeros(len(x)), np.zeros(len(x)))
+        duration = len(x) / rate
+        path_length = np.hypot(np.diff(x), np.diff(y)).sum()
+        summary.update(
+            duration_ms=t[-1] - t[0],
+            path_length_mm=path_length,
+            mean_speed=speed.mean(),
+            peak_speed=speed.max(),
+            rms_jerk=np.sqrt(np.mean(jerk ** 2)),
+            dfa_alpha_y=dfa_alpha(y),
+            dfa_alpha_speed=dfa_alpha(speed),
+        )
+        if path_length > 0:
+            summary['normalized_jerk'] = np.sqrt(0.5 * np.sum(jerk ** 2) / rate * duration ** 5 / path_length ** 2)
+        profiles.append((speed, jerk))
+        if len(x) >= 3:
+            analyzed.append(summary)
+            ys.append(y)
+            speeds.append(speed)
+
+    # One batched FFT per signal for the whole chunk
+    for summary, slope_y, slope_speed in zip(analyzed, psd_slopes(ys, rate), psd_slopes(speeds, rate)):
+        summary['psd_slope_y'] = slope_y
+        summary['psd_slope_speed'] = slope_speed
+    return summaries, profiles
+
+
+def find_trials(root: Path) -> list[str]:
+    """Finds the trials under a participant or study directory: trial CSV files and trials of binary block results files."""
+    root = Path(root)
+    trials = [str(path) for path in sorted(root.rglob("*.csv")) if path.stem.rpartition('_')[2].isdigit()]
+    for path in sorted(root.rglob(f"*{BINARY_RESULTS_SUFFIX}")):
+        prefix = path.name[:-len(BINARY_RESULTS_SUFFIX)]
+        # Trials that were also written as CSV files are analyzed once
+        exported = {Path(trial).stem for trial in trials if Path(trial).parent == path.parent}
+        block = BlockResults(path)
+        trials += [f"{path}#{index}" for index, test_number in enumerate(block.trials['test_number'].tolist())
+                   if f"{prefix}_{test_number}" not in exported]
+    return trials
+
+
+def write_summary(summaries: list[dict], output_path: Path) -> None:
+    with Path(output_path).open(mode="w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(['path', *SUMMARY_FIELDS])
+        writer.writerows([summary['path'], *[summary[name] for name in SUMMARY_FIELDS]] for summary in summaries)
+
+
+def write_profiles(summaries: list[dict], profiles: list[tuple[np.ndarray, np.ndarray]], output_path: Path, rate: float = ANALYSIS_RATE) -> None:
+    """Writes the speed and jerk profiles of all trials to one `.npz` file, split by `offsets`."""
+    lengths = [len(speed) for speed, _ in profiles]
+    np.savez(
+        output_path,
+        paths=np.array([summary['path'] for summary in summaries]),
+        rate=rate,
+        speed=np.concatenate([speed for speed, _ in profiles]) if profiles else np.empty(0),
+        jerk=np.concatenate([jerk for _, jerk in profiles]) if profiles else np.empty(0),
+        offsets=np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Spectral and kinematic analysis of recorded pen trajectories.")
+    parser.add_argument('roots', nargs='+', help="participant or study directories")
+    parser.add_argument('--rate', type=float, default=ANALYSIS_RATE, help="resampling rate in Hz")
+    parser.add_argument('--workers', type=int, default=None, help="number of worker processes (default: number of CPUs)")
+    parser.add_argument('--output', default='analysis_summary.csv', help="path of the summary CSV file")
+    parser.add_argument('--profiles', help="also write the speed and jerk profiles to this .npz file")
+    parser.add_argument('--source', choices=list(TRIAL_SOURCES), default='trial',
+                        help="samples to analyze: the trial files, or their resampled or raw tablet event files")
+    args = parser.parse_args()
+
+    trials = [trial for root in args.roots for trial in find_trials(root)]
+    chunks = [trials[start:start + CHUNK_SIZE] for start in range(0, len(trials), CHUNK_SIZE)]
+    summaries, profiles = [], []
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        for chunk_summaries, chunk_profiles in executor.map(analyze_trials, chunks, [args.rate] * len(chunks), [args.source] * len(chunks)):
+            summaries += chunk_summaries
+            profiles += chunk_profiles
+
+    write_summary(summaries, args.output)
+    if args.profiles:
+        write_profiles(summaries, profiles, args.profiles, args.rate)
+    print(f"Analyzed {len(summaries)} trials. Summary saved at: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import time
+import threading
+from collections import deque
+import numpy as np
+from config import (
+    START_FREQUENCY, START_DURATION_MS, SUCCESS_FREQUENCY, SUCCESS_DURATION_MS,
+    FAILURE_FREQUENCY, FAILURE_DURATION_MS, AUDIO_SAMPLE_RATE, AUDIO_LATENCY
+)
+
+
+def render_beep(frequency: float, duration: float, sample_rate: int = AUDIO_SAMPLE_RATE) -> np.ndarray:
+    """Renders a sine wave of the given frequency (Hz) and duration (s) as a mono float32 buffer."""
+    t = np.linspace(0, duration, int(sample_rate * duration), False)
+    return np.sin(2 * np.pi * frequency * t).astype(np.float32)
+
+
+class CuePlayer:
+    def __init__(self, cues: dict[str, tuple[float, float]], sample_rate: int = AUDIO_SAMPLE_RATE, latency=AUDIO_LATENCY, enabled: bool = True):
+        """
+        Plays pre-rendered audio cues on a single persistent output stream.
+
+        The cue buffers are rendered once, and `play` only hands the cue to the stream callback,
+        so triggering a cue never blocks. The onset latency of each cue, from the `play` call to
+        the moment its first sample reaches the DAC, is measured in the callback and printed by a
+        background logger thread.
+
+        Args:
+            cues (dict[str, tuple[float, float]]): Frequency (Hz) and duration (s) of each cue by name.
+            sample_rate (int): Sample rate of the output stream.
+            latency: Latency setting passed to the output stream ('low', 'high' or seconds).
+            enabled (bool): If False, no stream is opened and `play` does nothing.
+        """
+        self.sample_rate = sample_rate
+        self.latency = latency
+        self.enabled = enabled
+        self.buffers = {name: render_beep(frequency, duration, sample_rate) for name, (frequency, duration) in cues.items()}
+        self.stream = None
+        self.onset_latencies_ms = {}            # cue name -> onset latency of its last play
+
+        self._requests = deque()                # (name, label, request time) of the cues to start
+        self._buffer = None
+        self._position = 0
+        self._log = deque()
+        self._log_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """
+        Opens the output stream, if it is not already open.
+
+        If no stream can be opened, e.g. without an audio device or the PortAudio library, a
+        warning is printed once and the cues are disabled, so the test runs on without sound.
+        """
+        with self._lock:
+            if self.stream is not None or not self.enabled:
+                return
+            try:
+                import sounddevice as sd
+
+                stream = sd.OutputStream(
+                    samplerate=self.sample_rate, channels=1, dtype='float32',
+                    latency=self.latency, callback=self._callback
+                )
+                stream.start()
+            except Exception as e:
+                print(f"Warning: audio cues disabled, no output stream could be opened: {e}")
+                self.enabled = False
+                return
+            self.stream = stream
+            threading.Thread(target=self._log_latencies, daemon=True).start()
+
+    def close(self) -> None:
+        """Closes the output stream."""
+        with self._lock:
+            if self.stream is not None:
+                self.stream.close()
+                self.stream = None
+
+    def play(self, name: str, label=None) -> None:
+        """Starts playing a cue, replacing the one currently playing. Returns immediately."""
+        if not self.enabled:
+            return
+        if self.stream is None:
+            self.start()
+        self._requests.append((name, label, time.perf_counter_ns()))
+
+    def _callback(self, outdata, frames, time_info, status) -> None:
+        while self._requests:
+            name, label, request_ns = self._requests.popleft()
+            self._buffer = self.buffers[name]
+            self._position = 0
+            waited_ms = (time.perf_counter_ns() - request_ns) / 1e6
+            output_delay_ms = (time_info.outputBufferDacTime - time_info.currentTime) * 1000
+            self._log.append((name, label, waited_ms + max(output_delay_ms, 0)))
+            self._log_event.set()
+
+        outdata.fill(0)
+        if self._buffer is not None:
+            chunk = self._buffer[self._position:self._position + frames]
+            outdata[:len(chunk), 0] = chunk
+            self._position += len(chunk)
+            if self._position >= len(self._buffer):
+                self._buffer = None
+
+    def _log_latencies(self) -> None:
+        while True:
+            self._log_event.wait()
+            self._log_event.clear()
+            while self._log:
+                name, label, latency_ms = self._log.popleft()
+                self.onset_latencies_ms[name] = latency_ms
+                trial = f" (test {label})" if label is not None else ""
+                print(f"Cue '{name}'{trial} onset latency: {latency_ms:.1f} ms")
+
+
+_cue_player = None
+
+
+def get_cue_player() -> CuePlayer:
+    """Returns the cue player of the session, with the start, success and failure beeps from the config."""
+    global _cue_player
+    if _cue_player is None:
+        _cue_player = CuePlayer({
+            'start': (START_FREQUENCY, START_DURATION_MS),
+            'success': (SUCCESS_FREQUENCY, SUCCESS_DURATION_MS),
+            'failure': (FAILURE_FREQUENCY, FAILURE_DURATION_MS),
+        })
+    return _cue_player
+
+
+def disable_cues() -> None:
+    """Turns the cues of the session off, e.g. for simulated runs on machines without an audio device."""
+    get_cue_player().enabled = False
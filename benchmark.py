@@ -0,0 +1,401 @@
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")      # no display needed, shapes only import QtGui
+
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import threading
+import contextlib
+from io import StringIO
+from pathlib import Path
+from datetime import datetime
+import numpy as np
+from config import INPUT_DATA_FILE_NAME, INPUT_CIRCLES_FILE_NAME, INPUT_RECTS_FILE_NAME
+from models import Data, State, ScreenDimensions
+from collision import CollisionEngine
+from shapes import Circle, Rectangle
+from trial_set import TrialSet, read_trial_set_from_excel, load_trial_set, CIRCLE_DATA_SIZE, RECT_DATA_SIZE
+from recorder import TrialRecorder, trial_csv_header
+from results_store import BlockResultWriter
+from sample_buffer import SAMPLE_DTYPE
+from sampling import Sampler, SampleQueue
+from utils import create_input_file_from_excel
+
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+DEFAULT_TOLERANCE = 0.25            # a case regresses when its median is more than 25% slower than the baseline
+DEFAULT_REPEAT = 5
+DIMENSIONS = ScreenDimensions.from_size(1920, 1080, 52.7, 29.6)
+SEED = 0
+
+OBSTACLE_COUNTS = (0, 1, 4, 32, 256)
+HIT_TEST_OBSTACLE_COUNTS = (1, 4, 12, 32)   # around COLLISION_BATCH_MIN_OBSTACLES, the shipped blocks have 1
+SEGMENT_COUNT = 10_000
+TRIAL_SET_ROWS = (10, 100, 1_000, 10_000)
+TRIAL_SET_SHAPES = (4, 4)           # middle circles and rectangles per row
+TRIAL_SAMPLES = (2_000, 12_000, 120_000)     # 10 s, 1 min and 10 min at 200 Hz
+SAMPLER_RATES = (120, 200, 1000)    # Hz
+SAMPLER_DURATION_S = 0.5
+COMPARED_METRICS = ('mean_jitter_us',)      # metrics reported by a case that are also compared, lower is better
+
+
+def measure(run, repeat: int = DEFAULT_REPEAT) -> list[int]:
+    """Times `repeat` calls of `run` and returns the duration of each in ns."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        run()
+        durations.append(time.perf_counter_ns() - start)
+    return durations
+
+
+######################################################################################
+#                                                                                    #
+#                                Synthetic inputs                                    #
+#                                                                                    #
+######################################################################################
+
+def synthetic_trial(num_obstacles: int, rng: np.random.Generator) -> tuple:
+    """Returns the `Data` arguments of a trial with obstacles spread between the source and the destination, half of them circles."""
+    num_circles = num_obstacles // 2
+    num_rects = num_obstacles - num_circles
+    circles = [(x, y, 0.5) for x, y in zip(rng.uniform(-15, 7, num_circles), rng.uniform(-6, 6, num_circles))]
+    rects = [(x, y, 1, 1) for x, y in zip(rng.uniform(-15, 7, num_rects), rng.uniform(-6, 6, num_rects))]
+    return 2000, 200, (-18, 0, 0.5), (10, 0, 0.5), circles, rects
+
+
+def synthetic_path(data: Data, num_samples: int, rng: np.random.Generator) -> list[tuple]:
+    """Returns tablet samples in pixels, moving from the source to the destination with some noise."""
+    progress = np.linspace(0, 1, num_samples)
+    x = data.source_circle.x + progress * (data.dest_circle.x - data.source_circle.x)
+    y = data.source_circle.y + 40 * np.sin(6 * np.pi * progress) + rng.normal(0, 2, num_samples)
+    return [(x, y, 0.5, 10.0, -5.0, 0.0, i * 5, i * 5.0) for i, (x, y) in enumerate(zip(x.tolist(), y.tolist()))]
+
+
+def write_synthetic_excel(directory: str, num_rows: int, rng: np.random.Generator) -> None:
+    """Writes the three Excel files of a block with `num_rows` trials and a few empty shapes per row."""
+    import pandas as pd
+
+    num_circles, num_rects = TRIAL_SET_SHAPES
+    general = np.tile([2000, 200, -18, 0, 0.5, 10, 0, 0.5], (num_rows, 1))
+    circles = np.stack([rng.uniform(-15, 7, (num_rows, num_circles)), rng.uniform(-6, 6, (num_rows, num_circles)),
+                        np.full((num_rows, num_circles), 0.5)], axis=-1)
+    circles[rng.random((num_rows, num_circles)) < 0.3] = 0
+    rects = np.stack([rng.uniform(-15, 7, (num_rows, num_rects)), rng.uniform(-6, 6, (num_rows, num_rects)),
+                      np.ones((num_rows, num_rects)), np.ones((num_rows, num_rects))], axis=-1)
+    rects[rng.random((num_rows, num_rects)) < 0.3] = 0
+    sheets = (
+        (INPUT_DATA_FILE_NAME, general),
+        (INPUT_CIRCLES_FILE_NAME, circles.reshape(num_rows, num_circles * CIRCLE_DATA_SIZE)),
+        (INPUT_RECTS_FILE_NAME, rects.reshape(num_rows, num_rects * RECT_DATA_SIZE)),
+    )
+    for name, values in sheets:
+        pd.DataFrame(values).to_excel(os.path.join(directory, name), header=False, index=False)
+
+
+######################################################################################
+#                                                                                    #
+#                                  Benchmarks                                        #
+#                                                                                    #
+######################################################################################
+# Each benchmark prepares its inputs and returns the timed function and the number of
+# operations it performs, e.g. samples or rows, so results are reported per operation.
+
+def bench_process_input_data(num_obstacles: int, work_dir: str):
+    rng = np.random.default_rng(SEED)
+    data = Data(*synthetic_trial(num_obstacles, rng), dimensions=DIMENSIONS)
+    samples = synthetic_path(data, 2000, rng)
+
+    def run():
+        data.state = State(data)
+        for sample in samples:
+            data.process_input_data(sample, sample[-1])
+    return run, len(samples)
+
+
+def _hit_test_trial(num_obstacles: int, batch: bool):
+    """Processes a trial like `bench_process_input_data`, forcing the scalar or the NumPy batch hit tests without a grid."""
+    rng = np.random.default_rng(SEED)
+    data = Data(*synthetic_trial(num_obstacles, rng), dimensions=DIMENSIONS)
+    data.collision_engine = CollisionEngine(data.middle_circles, data.rects) if batch else None
+    samples = synthetic_path(data, 2000, rng)
+
+    def run():
+        data.state = State(data)
+        for sample in samples:
+            data.process_input_data(sample, sample[-1])
+    return run, len(samples)
+
+
+def bench_scalar_hit_tests(num_obstacles: int, work_dir: str):
+    return _hit_test_trial(num_obstacles, batch=False)
+
+
+def bench_batch_hit_tests(num_obstacles: int, work_dir: str):
+    return _hit_test_trial(num_obstacles, batch=True)
+
+
+def _random_segments(rng: np.random.Generator) -> list[tuple]:
+    start = rng.uniform(0, 400, (SEGMENT_COUNT, 2))
+    end = start + rng.normal(0, 20, (SEGMENT_COUNT, 2))
+    return np.concatenate([start, end], axis=-1).tolist()
+
+
+def bench_circle_segments(size: int, work_dir: str):
+    rng = np.random.default_rng(SEED)
+    circle = Circle(200, 200, 40, 30)
+    segments = _random_segments(rng)
+
+    def run():
+        for x1, y1, x2, y2 in segments:
+            circle.check_hit_line_segment(x1, y1, x2, y2)
+    return run, len(segments)
+
+
+def bench_rect_segments(size: int, work_dir: str):
+    rng = np.random.default_rng(SEED)
+    rect = Rectangle(160, 170, 80, 60)
+    segments = _random_segments(rng)
+
+    def run():
+        for x1, y1, x2, y2 in segments:
+            rect.check_hit_line_segments(x1, y1, x2, y2)
+    return run, len(segments)
+
+
+def _excel_block(num_rows: int, work_dir: str) -> str:
+    directory = os.path.join(work_dir, f"excel_{num_rows}")
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+        write_synthetic_excel(directory, num_rows, np.random.default_rng(SEED))
+    return directory
+
+
+def bench_create_input_file(num_rows: int, work_dir: str):
+    directory = _excel_block(num_rows, work_dir)
+    output_file = os.path.join(directory, 'input.csv')
+
+    def run():
+        with contextlib.redirect_stdout(StringIO()):
+            create_input_file_from_excel(directory, output_file)
+    return run, num_rows
+
+
+def bench_read_trial_set(num_rows: int, work_dir: str):
+    directory = _excel_block(num_rows, work_dir)
+    return lambda: read_trial_set_from_excel(directory), num_rows
+
+
+def bench_load_compiled_trial_set(num_rows: int, work_dir: str):
+    directory = _excel_block(num_rows, work_dir)
+    with contextlib.redirect_stdout(StringIO()):
+        load_trial_set(directory)
+    return lambda: load_trial_set(directory), num_rows
+
+
+def bench_build_trials(num_rows: int, work_dir: str):
+    """Turns every row of a trial set into the `Data` of a trial, like the page manager does for each test."""
+    directory = _excel_block(num_rows, work_dir)
+    with contextlib.redirect_stdout(StringIO()):
+        trial_set: TrialSet = load_trial_set(directory)
+
+    def run():
+        for index in range(len(trial_set)):
+            Data(*trial_set.trial(index), 75, dimensions=DIMENSIONS)
+    return run, num_rows
+
+
+def _recorded_trial(num_samples: int) -> tuple[list[tuple], np.ndarray, list, list]:
+    rng = np.random.default_rng(SEED)
+    data = Data(*synthetic_trial(8, rng), dimensions=DIMENSIONS)
+    for sample in synthetic_path(data, num_samples, rng):
+        data.process_input_data(sample, sample[-1])
+    state = data.state
+    state.time = num_samples * 5.0
+    rows = [state.points[i] for i in range(len(state.points))]
+    return rows, state.points.view(), state.circles_hit, state.rects_hit
+
+
+def bench_save_trial_csv(num_samples: int, work_dir: str):
+    """Streams a long trial through the recorder and finalizes its CSV file, the work behind `TestPage.save_data`."""
+    rows, _, circles_hit, rects_hit = _recorded_trial(num_samples)
+    header = trial_csv_header(len(circles_hit), len(rects_hit))
+    summary = [len(rows) * 5.0, 1, 0, 0, 1, 1, *circles_hit, *rects_hit, 0.1]
+    output_path = Path(work_dir) / f"trial_{num_samples}.csv"
+
+    def run():
+        with contextlib.redirect_stdout(StringIO()):
+            recorder = TrialRecorder(output_path)
+            recorder.start()
+            for row in rows:
+                recorder.append(row)
+            recorder.finish(header, summary)
+            recorder.wait()
+    return run, num_samples
+
+
+def bench_save_binary_results(num_samples: int, work_dir: str):
+    """Adds a long trial to a block result writer and writes the block file."""
+    _, samples, circles_hit, rects_hit = _recorded_trial(num_samples)
+    path = Path(work_dir) / f"block_{num_samples}.results.npz"
+
+    def run():
+        with contextlib.redirect_stdout(StringIO()):
+            writer = BlockResultWriter(path)
+            writer.add_trial(1, samples.astype(SAMPLE_DTYPE), len(samples) * 5.0, 1, 0, 0, 1, 1, circles_hit, rects_hit, 0.1)
+            writer.save()
+    return run, num_samples
+
+
+def bench_sampler(rate: int, work_dir: str):
+    """
+    Samples for a fixed time into a queue drained by another thread, like the reading and processing threads of a trial.
+
+    The time per operation is the wall time per expected tick, so the rate and jitter the
+    sampler achieved are reported as metrics of the case.
+    """
+    queue = SampleQueue()
+    sampler = Sampler(rate, lambda now: queue.put((now, 0.0)))
+
+    def run():
+        queue.reset()
+        start = time.perf_counter_ns()
+        end = start + int(SAMPLER_DURATION_S * 1e9)
+        reader = threading.Thread(target=lambda: (sampler.run(start, lambda: time.perf_counter_ns() < end), queue.close()))
+        reader.start()
+        while queue.get_batch():
+            pass
+        reader.join()
+        return sampler.report()
+    return run, int(SAMPLER_DURATION_S * rate)
+
+
+BENCHMARKS = (
+    # name, function, sizes
+    ('process_input_data', bench_process_input_data, OBSTACLE_COUNTS),
+    ('scalar_hit_tests', bench_scalar_hit_tests, HIT_TEST_OBSTACLE_COUNTS),
+    ('batch_hit_tests', bench_batch_hit_tests, HIT_TEST_OBSTACLE_COUNTS),
+    ('circle_segment_hits', bench_circle_segments, (SEGMENT_COUNT,)),
+    ('rect_segment_hits', bench_rect_segments, (SEGMENT_COUNT,)),
+    ('create_input_file_from_excel', bench_create_input_file, TRIAL_SET_ROWS),
+    ('read_trial_set_from_excel', bench_read_trial_set, TRIAL_SET_ROWS),
+    ('load_compiled_trial_set', bench_load_compiled_trial_set, TRIAL_SET_ROWS),
+    ('build_trials', bench_build_trials, TRIAL_SET_ROWS),
+    ('save_trial_csv', bench_save_trial_csv, TRIAL_SAMPLES),
+    ('save_binary_results', bench_save_binary_results, TRIAL_SAMPLES),
+    ('sampler', bench_sampler, SAMPLER_RATES),
+)
+
+
+######################################################################################
+#                                                                                    #
+#                                Baseline files                                      #
+#                                                                                    #
+######################################################################################
+
+def run_benchmarks(selected: list[str] | None = None, repeat: int = DEFAULT_REPEAT, max_size: int | None = None) -> dict:
+    """
+    Runs the benchmarks and returns their results keyed by `<name>[<size>]`.
+
+    Each case is timed `repeat` times and reported in ns per operation, e.g. per sample or per
+    row. The median is compared against baselines; the minimum shows the best case. Cases whose
+    timed function returns a dict, like the sampler's report, also get the median of each value.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name, function, sizes in BENCHMARKS:
+            if selected and not any(pattern in name for pattern in selected):
+                continue
+            for size in sizes:
+                if max_size is not None and size > max_size:
+                    continue
+                run, ops = function(size, work_dir)
+                run()           # warm-up: imports, caches, first file creation
+                reports = []
+                durations = measure(lambda: reports.append(run()), repeat)
+                key = f"{name}[{size}]"
+                results[key] = {
+                    'ops': ops,
+                    'repeat': repeat,
+                    'median_ns_per_op': float(np.median(durations)) / ops,
+                    'min_ns_per_op': min(durations) / ops,
+                }
+                print(f"{key:<40} {results[key]['median_ns_per_op'] / 1e3:>10.2f} us/op (min {results[key]['min_ns_per_op'] / 1e3:.2f})")
+                if isinstance(reports[0], dict):
+                    results[key]['metrics'] = {metric: float(np.median([report[metric] for report in reports])) for metric in reports[0]}
+                    print(f"{'':<40} " + ", ".join(f"{metric}: {value:.2f}" for metric, value in results[key]['metrics'].items()))
+    return results
+
+
+def environment() -> dict:
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'system': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def save_baseline(results: dict, path: Path) -> None:
+    baseline = {'created': datetime.now().isoformat(timespec='seconds'), 'environment': environment(), 'results': results}
+    with Path(path).open(mode="w") as file:
+        json.dump(baseline, file, indent=4)
+    print(f"Baseline saved at: {path}")
+
+
+def compare(results: dict, path: Path, tolerance: float = DEFAULT_TOLERANCE) -> list[str]:
+    """
+    Compares results against a baseline file and returns the cases whose median is more than
+    `tolerance` slower, or whose `COMPARED_METRICS` are more than `tolerance` higher.
+    """
+    with Path(path).open() as file:
+        baseline = json.load(file)
+    if baseline['environment'] != environment():
+        print("Warning: the baseline was recorded in a different environment, timings may not be comparable.")
+
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline['results']:
+            continue
+        ratio = result['median_ns_per_op'] / baseline['results'][key]['median_ns_per_op']
+        flag = 'REGRESSION' if ratio > 1 + tolerance else ''
+        print(f"{key:<40} {ratio:>6.2f}x baseline {flag}")
+        if flag:
+            regressions.append(key)
+        for metric in COMPARED_METRICS:
+            value, baseline_value = result.get('metrics', {}).get(metric), baseline['results'][key].get('metrics', {}).get(metric)
+            if value is None or not baseline_value:
+                continue
+            ratio = value / baseline_value
+            flag = 'REGRESSION' if ratio > 1 + tolerance else ''
+            print(f"{f'{key} {metric}':<40} {ratio:>6.2f}x baseline {flag}")
+            if flag:
+                regressions.append(f"{key} {metric}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the sampling, collision and I/O paths without a display.")
+    parser.add_argument('benchmarks', nargs='*', help="run only the benchmarks whose name contains one of these")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="timed runs per case")
+    parser.add_argument('--max-size', type=int, help="skip cases larger than this, e.g. 1000 for a quick run")
+    parser.add_argument('--save', nargs='?', const=DEFAULT_BASELINE, metavar='PATH', help="save the results as the baseline")
+    parser.add_argument('--compare', nargs='?', const=DEFAULT_BASELINE, metavar='PATH', help="compare the results against a baseline")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help="allowed slowdown before a case counts as a regression")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.benchmarks, args.repeat, args.max_size)
+    regressions = compare(results, args.compare, args.tolerance) if args.compare else []
+    if args.save:
+        save_baseline(results, args.save)
+    if regressions:
+        print(f"{len(regressions)} regressions: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
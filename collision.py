@@ -0,0 +1,232 @@
+import numpy as np
+from math import floor
+from shapes import Circle, Rectangle
+
+
+class CollisionEngine:
+    def __init__(self, circles: list[Circle], rects: list[Rectangle], cell_size: float | None = None):
+        """
+        Hit tests against all middle circles and rectangles of a trial at once.
+
+        The shapes are stored as precomputed NumPy arrays, so a new sample or segment is
+        tested against every obstacle in one batched call. The results match
+        `Circle.check_hit`, `Circle.check_hit_line_segment`, `Rectangle.check_hit` and
+        `Rectangle.check_hit_line_segments` exactly.
+
+        Args:
+            circles (list[Circle]): The middle circles, in pixels.
+            rects (list[Rectangle]): The rectangles, in pixels.
+            cell_size (float | None): If given, a `SpatialGrid` with cells of this size in pixels
+                is built so `hit_indices` only tests the shapes near the sample.
+        """
+        self.num_circles = len(circles)
+        self.num_rects = len(rects)
+
+        self.circle_x = np.array([circle.x for circle in circles], dtype=float)
+        self.circle_y = np.array([circle.y for circle in circles], dtype=float)
+        self.circle_rx = np.array([circle.rx for circle in circles], dtype=float)
+        self.circle_ry = np.array([circle.ry for circle in circles], dtype=float)
+        self.circle_r = np.maximum(self.circle_rx, self.circle_ry)
+
+        self.rect_x = np.array([rect.x for rect in rects], dtype=float)
+        self.rect_y = np.array([rect.y for rect in rects], dtype=float)
+        self.rect_x2 = self.rect_x + np.array([rect.w for rect in rects], dtype=float)
+        self.rect_y2 = self.rect_y + np.array([rect.h for rect in rects], dtype=float)
+
+        # Edges in the order used by Rectangle.check_hit_line_segments: top, left, right, bottom
+        self.edge_x3 = np.stack([self.rect_x, self.rect_x, self.rect_x2, self.rect_x], axis=-1)
+        self.edge_y3 = np.stack([self.rect_y, self.rect_y, self.rect_y, self.rect_y2], axis=-1)
+        self.edge_x4 = np.stack([self.rect_x2, self.rect_x, self.rect_x2, self.rect_x2], axis=-1)
+        self.edge_y4 = np.stack([self.rect_y, self.rect_y2, self.rect_y2, self.rect_y2], axis=-1)
+
+        self.spatial_index = None
+        if cell_size is not None:
+            circle_bounds = np.stack([
+                self.circle_x - self.circle_r, self.circle_y - self.circle_r,
+                self.circle_x + self.circle_r, self.circle_y + self.circle_r
+            ], axis=-1)
+            rect_bounds = np.stack([
+                np.minimum(self.rect_x, self.rect_x2), np.minimum(self.rect_y, self.rect_y2),
+                np.maximum(self.rect_x, self.rect_x2), np.maximum(self.rect_y, self.rect_y2)
+            ], axis=-1)
+            self.spatial_index = SpatialGrid(circle_bounds, rect_bounds, cell_size)
+
+    def hit_indices(self, x: float, y: float, prev: tuple[float, float] | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Like `hits`, but returns the indices of the circles and rectangles that were hit.
+
+        When a spatial index is present only the shapes in the grid cells covered by the
+        sample, or by the segment from `prev`, are tested.
+        """
+        if self.spatial_index is None:
+            circles_hit, rects_hit = self.hits(x, y, prev)
+            return np.flatnonzero(circles_hit), np.flatnonzero(rects_hit)
+
+        if prev is None:
+            circle_idx, rect_idx = self.spatial_index.query(x, y, x, y)
+        else:
+            circle_idx, rect_idx = self.spatial_index.query(min(x, prev[0]), min(y, prev[1]), max(x, prev[0]), max(y, prev[1]))
+        if not len(circle_idx) and not len(rect_idx):
+            return circle_idx, rect_idx
+        circles_hit, rects_hit = self.hits(x, y, prev, circle_idx, rect_idx)
+        return circle_idx[circles_hit], rect_idx[rects_hit]
+
+    def hits(self, x: float, y: float, prev: tuple[float, float] | None = None, circle_idx=None, rect_idx=None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Tests a new sample, and the segment from the previous sample if given, against the obstacles.
+
+        Args:
+            x (float): x-coordinate of the sample, in pixels.
+            y (float): y-coordinate of the sample, in pixels.
+            prev (tuple[float, float] | None): The previous sample, in pixels.
+            circle_idx: Optional indices restricting which circles are tested.
+            rect_idx: Optional indices restricting which rectangles are tested.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Boolean hit masks over the tested circles and rectangles.
+        """
+        cx, cy, rx, ry, r = self.circle_x, self.circle_y, self.circle_rx, self.circle_ry, self.circle_r
+        if circle_idx is not None:
+            cx, cy, rx, ry, r = cx[circle_idx], cy[circle_idx], rx[circle_idx], ry[circle_idx], r[circle_idx]
+        circles_hit = np.sqrt((cx - x) ** 2 + (cy - y) ** 2) <= r
+
+        rx1, ry1, rx2, ry2 = self.rect_x, self.rect_y, self.rect_x2, self.rect_y2
+        edges = self.edge_x3, self.edge_y3, self.edge_x4, self.edge_y4
+        if rect_idx is not None:
+            rx1, ry1, rx2, ry2 = rx1[rect_idx], ry1[rect_idx], rx2[rect_idx], ry2[rect_idx]
+            edges = tuple(edge[rect_idx] for edge in edges)
+        rects_hit = (rx1 <= x) & (x <= rx2) & (ry1 <= y) & (y <= ry2)
+
+        if prev is not None and (x, y) != tuple(prev):
+            circles_hit |= _segment_hits_ellipses(x, y, *prev, cx, cy, rx, ry)
+            rects_hit |= _segment_hits_edges(x, y, *prev, *edges).any(axis=-1)
+        return circles_hit, rects_hit
+
+    def trajectory_hits(self, xs, ys, first_segment: int = 2, chunk_size: int = 4096) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Tests a whole trajectory at once, for offline use.
+
+        Every sample is tested as a point and every pair of consecutive samples as a segment,
+        like feeding the samples one by one through `hits`.
+
+        Args:
+            xs: x-coordinates of the samples, in pixels.
+            ys: y-coordinates of the samples, in pixels.
+            first_segment (int): Index of the first sample whose segment from its predecessor is
+                tested. Defaults to 2, the third sample, like `Data.process_input_data`.
+            chunk_size (int): Number of samples tested per batch, bounds the memory used.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Boolean masks of the circles and rectangles hit anywhere.
+        """
+        xs = np.asarray(xs, dtype=float)
+        ys = np.asarray(ys, dtype=float)
+        circles_hit = np.zeros(self.num_circles, dtype=bool)
+        rects_hit = np.zeros(self.num_rects, dtype=bool)
+
+        for start in range(0, len(xs), chunk_size):
+            end = min(start + chunk_size, len(xs))
+            x = xs[start:end, None]
+            y = ys[start:end, None]
+            circles_hit |= (np.sqrt((self.circle_x - x) ** 2 + (self.circle_y - y) ** 2) <= self.circle_r).any(axis=0)
+            rects_hit |= ((self.rect_x <= x) & (x <= self.rect_x2) & (self.rect_y <= y) & (y <= self.rect_y2)).any(axis=0)
+
+            # Segments ending at the samples of this chunk
+            first = max(start, first_segment)
+            x1 = xs[first:end, None]
+            y1 = ys[first:end, None]
+            x2 = xs[first - 1:end - 1, None]
+            y2 = ys[first - 1:end - 1, None]
+            moved = ((x1 != x2) | (y1 != y2))
+            circles_hit |= (_segment_hits_ellipses(x1, y1, x2, y2, self.circle_x, self.circle_y, self.circle_rx, self.circle_ry) & moved).any(axis=0)
+            edges_hit = _segment_hits_edges(x1[..., None], y1[..., None], x2[..., None], y2[..., None], self.edge_x3, self.edge_y3, self.edge_x4, self.edge_y4)
+            rects_hit |= (edges_hit.any(axis=-1) & moved).any(axis=0)
+
+        return circles_hit, rects_hit
+
+
+class SpatialGrid:
+    # Padding of the shape bounds, so rounding in the hit tests can never reach past them
+    PADDING = 1e-6
+
+    def __init__(self, circle_bounds: np.ndarray, rect_bounds: np.ndarray, cell_size: float):
+        """
+        A uniform grid over the bounding boxes of the obstacles.
+
+        Every shape is registered in all cells its bounding box overlaps, so any point or
+        segment that can hit a shape lies in at least one cell listing it.
+
+        Args:
+            circle_bounds (np.ndarray): (n, 4) array of xmin, ymin, xmax, ymax per circle.
+            rect_bounds (np.ndarray): (m, 4) array of xmin, ymin, xmax, ymax per rectangle.
+            cell_size (float): Width and height of a cell, in pixels.
+        """
+        self.cell_size = cell_size
+        self.empty = (np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp))
+
+        circle_cells = self._register(circle_bounds)
+        rect_cells = self._register(rect_bounds)
+        self.cells = {
+            cell: (
+                np.array(circle_cells.get(cell, []), dtype=np.intp),
+                np.array(rect_cells.get(cell, []), dtype=np.intp)
+            )
+            for cell in circle_cells.keys() | rect_cells.keys()
+        }
+
+    def _cell_range(self, xmin, ymin, xmax, ymax) -> tuple[int, int, int, int]:
+        cell_size = self.cell_size
+        return floor(xmin / cell_size), floor(ymin / cell_size), floor(xmax / cell_size), floor(ymax / cell_size)
+
+    def _register(self, bounds: np.ndarray) -> dict:
+        cells = {}
+        for index, (xmin, ymin, xmax, ymax) in enumerate(bounds):
+            i0, j0, i1, j1 = self._cell_range(xmin - self.PADDING, ymin - self.PADDING, xmax + self.PADDING, ymax + self.PADDING)
+            for i in range(i0, i1 + 1):
+                for j in range(j0, j1 + 1):
+                    cells.setdefault((i, j), []).append(index)
+        return cells
+
+    def query(self, xmin: float, ymin: float, xmax: float, ymax: float) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the sorted indices of the circles and rectangles registered in the cells covering a box."""
+        i0, j0, i1, j1 = self._cell_range(xmin, ymin, xmax, ymax)
+        if i0 == i1 and j0 == j1:
+            return self.cells.get((i0, j0), self.empty)
+
+        found = [self.cells[(i, j)] for i in range(i0, i1 + 1) for j in range(j0, j1 + 1) if (i, j) in self.cells]
+        if not found:
+            return self.empty
+        if len(found) == 1:
+            return found[0]
+        return np.unique(np.concatenate([c for c, _ in found])), np.unique(np.concatenate([r for _, r in found]))
+
+
+def _segment_hits_ellipses(x1, y1, x2, y2, xc, yc, a, b) -> np.ndarray:
+    """Vectorized `Circle.check_hit_line_segment`, for a non-degenerate segment."""
+    dx = x2 - x1
+    dy = y2 - y1
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        A = (dx**2) / a**2 + (dy**2) / b**2
+        B = 2 * ((dx * (x1 - xc)) / a**2 + (dy * (y1 - yc)) / b**2)
+        C = ((x1 - xc)**2) / a**2 + ((y1 - yc)**2) / b**2 - 1
+
+        discriminant = B**2 - 4 * A * C
+        sqrt_discriminant = np.sqrt(np.maximum(discriminant, 0))
+        t1 = (-B + sqrt_discriminant) / (2 * A)
+        t2 = (-B - sqrt_discriminant) / (2 * A)
+
+    return (discriminant >= 0) & (((0 <= t1) & (t1 <= 1)) | ((0 <= t2) & (t2 <= 1)))
+
+
+def _orientation(xa, ya, xb, yb, xc, yc) -> np.ndarray:
+    return np.sign((yb - ya) * (xc - xb) - (xb - xa) * (yc - yb))
+
+
+def _segment_hits_edges(x1, y1, x2, y2, x3, y3, x4, y4) -> np.ndarray:
+    """Vectorized `Rectangle.check_hit_line_segment` against an array of edges."""
+    o1 = _orientation(x1, y1, x2, y2, x3, y3)
+    o2 = _orientation(x1, y1, x2, y2, x4, y4)
+    o3 = _orientation(x3, y3, x4, y4, x1, y1)
+    o4 = _orientation(x3, y3, x4, y4, x2, y2)
+    return (o1 != o2) & (o3 != o4)
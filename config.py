@@ -2,10 +2,15 @@
 # Paths
 INPUT_FILE_PATH = './test_input.csv'
 OUTPUT_DIR = './test_results/'
+WRITE_BINARY_RESULTS = False                # also write one columnar <block>.results.npz per block
 INPUT_DATA_FILE_NAME = "data.xlsx"
 INPUT_CIRCLES_FILE_NAME = "circles.xlsx"
 INPUT_RECTS_FILE_NAME = "rects.xlsx"
+COMPILED_TRIAL_SET_FILE_NAME = "trials.npz"
+GENERATED_MANIFEST_FILE_NAME = "generated.json"    # seed and parameters of a generated block, to rebuild its trials.npz
 DATA_DIRECTORY =  "data"
+SESSION_PROGRESS_FILE_NAME = "session_progress.json"      # last completed trial, saved in each participant's directory
+SCREEN_CALIBRATION_FILE = "screen_calibration.json"     # measured screen geometry, used instead of querying the screen if present
 
 # Origin x and y
 ORIGIN_X = 25                               # cm
@@ -13,9 +18,26 @@ ORIGIN_Y = 8.84                             # cm
 
 # Test Parameters
 DELAY_BETWEEN_TESTS = 1500                  # ms
-INDEX_OF_START_TEST = 0                     # Test to start from
 OFFSET_FROM_DEST_CM = 1
 MAX_NUM_OF_ADDITIONAL_RCORDED_POINTS = 10
+PREFETCH_TRIALS = 2                         # trials built ahead of time during the delay between tests
+
+# Telemetry
+TELEMETRY = False                           # record hot-path timings and write a <trial>.telemetry.json next to each trial file
+TELEMETRY_SUFFIX = '.telemetry.json'
+
+# Sampling
+SAMPLER_SPIN_US = 500                       # us, busy-wait window before each sample deadline
+WRITE_RESAMPLED = False                     # write the tablet events resampled at the trial rate to <trial>.resampled.csv
+RESAMPLED_SUFFIX = '.resampled.csv'
+RAW_CAPTURE = False                         # also write every tablet event, at the full tablet rate, to <trial>.raw.csv
+RAW_CAPTURE_SUFFIX = '.raw.csv'
+TABLET_TIMESTAMP_RESOLUTION_MS = 1          # ms, resolution of the hardware timestamps of tablet events
+
+# Collision
+COLLISION_BATCH_MIN_OBSTACLES = 12          # test the obstacles in NumPy batches for trials with at least this many, one by one below
+SPATIAL_INDEX_MIN_OBSTACLES = 32            # build a spatial grid for trials with at least this many obstacles
+SPATIAL_INDEX_CELL_SIZE_CM = 1              # cm
 
 # Form Params
 FORM_OPTIONS_TYPES = ['C1', 'C2', 'P1', 'P2','PR1', 'PR2', 'W1', 'W2', 'WR1', 'WR2', 'Pre-Test', 'Post-Test', 'Transfer']
@@ -29,6 +51,8 @@ RECT_COLOR               = (66, 209, 245)
 BACKGROUND_COLOR         = (255, 254, 212)
 SUCCESS_PATH_COLOR       = (0, 255, 0)
 FAILURE_PATH_COLOR       = (255, 0, 0)
+LIVE_PATH_COLOR          = (90, 90, 90)
+LIVE_PATH_PREVIEW        = False            # draw the pen trail while the test runs
 
 # Beep Sounds
 START_FREQUENCY     = 500
@@ -37,4 +61,6 @@ SUCCESS_FREQUENCY   = 750
 SUCCESS_DURATION_MS = 0.35             # sec
 FAILURE_FREQUENCY   = 1000
 FAILURE_DURATION_MS = 0.35             # sec
+AUDIO_SAMPLE_RATE   = 44100
+AUDIO_LATENCY       = 'low'            # output stream latency: 'low', 'high' or sec
 
@@ -0,0 +1,63 @@
+import sys
+import time
+import builtins
+import threading
+
+HEAVY_MODULES = ('numpy', 'pandas', 'openpyxl', 'sounddevice', 'matplotlib')
+
+
+class ImportTimer:
+    def __init__(self):
+        """
+        Records how long each module takes to import, like `python -X importtime`.
+
+        Only imports made from the thread that installed the timer are recorded. The self time
+        of a module excludes the time spent importing the modules it imports itself.
+        """
+        self.start_ns = time.perf_counter_ns()
+        self.timings = {}           # module name -> (cumulative ns, self ns)
+        self._stack = []
+        self._original_import = None
+        self._thread_id = None
+
+    def install(self) -> None:
+        """Starts recording imports."""
+        if self._original_import is None:
+            self._original_import = builtins.__import__
+            self._thread_id = threading.get_ident()
+            builtins.__import__ = self._import
+
+    def uninstall(self) -> None:
+        """Stops recording imports."""
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules or threading.get_ident() != self._thread_id:
+            return self._original_import(name, globals, locals, fromlist, level)
+
+        start = time.perf_counter_ns()
+        self._stack.append(0)
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter_ns() - start
+            children = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            self.timings.setdefault(name, (elapsed, elapsed - children))
+
+    def report(self, title: str = "Import time report", limit: int = 15) -> str:
+        """Formats the slowest imports and the heavy modules loaded so far."""
+        elapsed_ms = (time.perf_counter_ns() - self.start_ns) / 1e6
+        lines = [f"{title} ({elapsed_ms:.0f} ms since start)", f"{'cumulative':>12} {'self':>10}  module"]
+        slowest = sorted(self.timings.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+        for name, (cumulative, self_time) in slowest:
+            lines.append(f"{cumulative / 1e6:>9.1f} ms {self_time / 1e6:>7.1f} ms  {name}")
+        loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+        lines.append(f"Heavy modules loaded: {', '.join(loaded) if loaded else 'none'}")
+        return "\n".join(lines)
+
+
+import_timer = ImportTimer()
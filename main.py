@@ -1,47 +1,130 @@
 import sys
-from PyQt6.QtWidgets import QApplication, QMainWindow, QWidget
-from models import Data, ScreenDimensions
-from config import INPUT_FILE_PATH
+import argparse
+from import_report import import_timer
+if '--import-report' in sys.argv:
+	import_timer.install()
+
+from PyQt6.QtCore import QTimer
+from PyQt6.QtWidgets import QApplication, QMainWindow, QWidget, QMessageBox
+from models import Data, get_screen_dimensions
 from pages.form_page import FormPage
-from pages.test_page import TestPage, PageManager
 from pages.rest_page import RestPage
-from utils import create_input_file_from_excel
+from session import SessionScheduler, resolve_blocks
+from config import WRITE_BINARY_RESULTS, DATA_DIRECTORY, FORM_OPTIONS_TYPES
 from pathlib import Path
 import os
 
+# The trial pipeline (numpy, trial sets, test page) is imported on first use, and the
+# trial sets are loaded on a background thread, so the form shows up without waiting for them.
+
+PRELOAD_DELAY = 300             # ms without a new test type selection before its blocks start loading
+
 class MainWindow(QMainWindow):
-	def __init__(self):
+	def __init__(self, start_block: str | None = None, start_test: int = 1):
 		super().__init__()
 		# Initialize screen dimensions
-		self.dimensions = ScreenDimensions(QApplication.instance())
+		self.dimensions = get_screen_dimensions()
 		self.setWindowTitle("Main Window")
 		self.setGeometry(0, 0, self.dimensions.WINDOW_WIDTH_PIXELS, self.dimensions.WINDOW_HEIGHT_PIXELS)
 
 		self.input_dir: str | None = None
 		self.target_dir: str | None = None
 
-		self.folders: list | None = None
-		self.folder_index: int = 0
+		# Blocks of each test type, loaded in the background as soon as the type is selected
+		self.sessions: dict[str, SessionScheduler] = {}
+		self.session: SessionScheduler | None = None
+		self.block_index: int = 0
+		self.block_name: str | None = None
+		self.start_block = start_block
+		self.start_test_number = start_test
+		self.test_page = None
+
+		# Browsing through the test types only loads the blocks of the one that stays selected
+		self.preload_timer = QTimer(self)
+		self.preload_timer.setSingleShot(True)
+		self.preload_timer.setInterval(PRELOAD_DELAY)
+		self.preload_timer.timeout.connect(lambda: self.prepare_session(self.form_page.test_type_combo.currentText()))
 
 		# Display the initial FormPage
 		self.show_form_page()
-		self.form_page.form_submitted.connect(self.create_manager)
+
+	def prepare_session(self, test_type: str) -> None:
+		"""
+		Starts loading the blocks of a test type in the background, while the form is filled in.
+
+		The blocks of the previously selected test types that have not started loading are cancelled.
+		"""
+		input_dir = f'{DATA_DIRECTORY}/{test_type}'
+		for other_dir in [other_dir for other_dir in self.sessions if other_dir != input_dir]:
+			self.sessions.pop(other_dir).cancel()
+		if input_dir not in self.sessions and os.path.isdir(input_dir):
+			self.sessions[input_dir] = SessionScheduler(input_dir)
+
+	def start_session(self) -> None:
+		"""Starts the blocks of the submitted test type, resuming after the last completed trial if there is saved progress."""
+		self.preload_timer.stop()
+		if self.input_dir not in self.sessions:
+			self.sessions[self.input_dir] = SessionScheduler(self.input_dir)
+		self.session = self.sessions[self.input_dir]
+		if not len(self.session):
+			print(f"No blocks found in {self.input_dir}")
+			self.close()
+			return
+
+		if self.start_block is not None:
+			names = [name for name, _ in self.session.blocks]
+			if self.start_block not in names:
+				print(f"Block '{self.start_block}' not found in {self.input_dir}, its blocks are: {', '.join(names)}")
+				self.close()
+				return
+			self.block_index = names.index(self.start_block)
+		else:
+			if self.session.is_completed(self.target_dir) and not self.confirm_rerun():
+				self.show_form_page()
+				return
+			self.block_index, self.start_test_number = self.session.resume_point(self.target_dir)
+		if (self.block_index, self.start_test_number) != (0, 1):
+			print(f"Starting at block {self.session.block_name(self.block_index)}, test {self.start_test_number}")
+		self.create_manager()
 	
+	def confirm_rerun(self) -> bool:
+		"""Asks whether to run a completed session again, which overwrites its results."""
+		answer = QMessageBox.question(
+			self, "Session completed",
+			f"This participant has already completed every block of {self.input_dir}.\n"
+			f"Running the session again overwrites the results in {self.target_dir}. Run it again?",
+			QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.No
+		)
+		return answer == QMessageBox.StandardButton.Yes
+
 	def create_manager(self):
-		input_file = 'input.csv'
-		self.folders = [os.path.join(self.input_dir, folder) for folder in os.listdir(self.input_dir) if os.path.isdir(os.path.join(self.input_dir, folder))]
-		self.folders = sorted(self.folders, key=lambda x: int(os.path.basename(x)))
-		print(self.folders)
-		create_input_file_from_excel(self.folders[self.folder_index], input_file)
-		self.folder_index += 1
-		self.manager = PageManager(input_file)
+		from pages.test_page import PageManager
+		from results_store import BlockResultWriter, BINARY_RESULTS_SUFFIX
+
+		block_index = self.block_index
+		self.block_name = self.session.block_name(block_index)
+		trial_set = self.session.trial_set(block_index)
+		result_writer = None
+		if WRITE_BINARY_RESULTS:
+			result_writer = BlockResultWriter(Path(self.target_dir) / f"{self.block_name}{BINARY_RESULTS_SUFFIX}", self.start_test_number)
+		self.block_index += 1
+		self.manager = PageManager(trial_set, result_writer, self.start_test_number)
+		self.start_test_number = 1
 		self.manager.start_test_signal.connect(self.show_test_page)
+		self.manager.trial_completed_signal.connect(lambda test_number: self.session.save_progress(self.target_dir, block_index, test_number))
+		if result_writer is not None:
+			self.manager.trial_completed_signal.connect(lambda _: result_writer.save_in_background())
 		self.manager.finished_signal.connect(self.on_tests_complete)
 		self.manager.start_tests()
+		if import_timer.timings:
+			print(import_timer.report("Import time report after starting the block"))
 		
 	def show_form_page(self) -> None:
 		"""Display the form page."""
 		self.form_page = FormPage(self)
+		self.form_page.form_submitted.connect(self.start_session)
+		self.form_page.test_type_combo.currentTextChanged.connect(lambda _: self.preload_timer.start())
+		self.prepare_session(self.form_page.test_type_combo.currentText())
 		self.set_central_widget(self.form_page)
 
 	def show_rest_page(self) -> None:
@@ -50,13 +133,22 @@ class MainWindow(QMainWindow):
 		self.set_central_widget(self.rest_page)
 
 	def show_test_page(self, data: Data) -> None:
-		"""Display the test page with the given data."""
-		test_page = TestPage(data, self.target_dir, os.path.basename(self.folders[self.folder_index - 1]), self.manager)
-		self.set_central_widget(test_page)
+		"""Display the test page with the given data, reusing the page of the current block."""
+		from pages.test_page import TestPage
+		if self.test_page is not None:
+			self.test_page.load_trial(data)
+			return
+		self.test_page = TestPage(data, self.target_dir, self.block_name, self.manager)
+		self.set_central_widget(self.test_page)
 
 	def on_tests_complete(self) -> None:
 		"""Handle actions when all tests are completed."""
-		if self.folder_index < len(self.folders):
+		if self.manager.result_writer is not None:
+			self.manager.result_writer.close()
+		if self.test_page is not None:
+			self.test_page.close_workers()
+			self.test_page = None
+		if self.block_index < len(self.session):
 			self.show_rest_page()
 		else:	
 			self.close()
@@ -70,9 +162,24 @@ class MainWindow(QMainWindow):
 
 def main() -> None:
 	"""Main entry point of the application."""
-	app = QApplication(sys.argv)
-	main_window = MainWindow()
+	parser = argparse.ArgumentParser(description="Pink noise test.")
+	parser.add_argument('--import-report', action='store_true', help="print how long the startup imports take")
+	block_names = sorted(
+		{name for test_type in FORM_OPTIONS_TYPES if os.path.isdir(f'{DATA_DIRECTORY}/{test_type}') for name, _ in resolve_blocks(f'{DATA_DIRECTORY}/{test_type}')},
+		key=lambda name: (not name.isdigit(), int(name) if name.isdigit() else name)
+	)
+	parser.add_argument('--start-block', choices=block_names, metavar='BLOCK', help=f"name of the block to start from, instead of resuming the saved progress: {', '.join(block_names)}")
+	parser.add_argument('--start-test', type=int, help="test number to start from in the block given by --start-block (default: 1)")
+	args, qt_args = parser.parse_known_args()
+	# Without --start-block the session resumes from its saved progress, which sets the test number
+	if args.start_test is not None and args.start_block is None:
+		parser.error("--start-test requires --start-block")
+
+	app = QApplication([sys.argv[0], *qt_args])
+	main_window = MainWindow(args.start_block, args.start_test if args.start_test is not None else 1)
 	main_window.show()
+	if import_timer.timings:
+		QTimer.singleShot(0, lambda: print(import_timer.report("Import time report at form page")))
 	sys.exit(app.exec())
 
 
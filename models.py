@@ -1,7 +1,10 @@
+import os
+import json
+from dataclasses import dataclass, field
 from PyQt6.QtWidgets import QApplication
 from config import OFFSET_FROM_DEST_CM, SOURCE_CIRCLE_COLOR, DESTINATION_CIRCLE_COLOR, MIDDLE_CIRCLE_COLOR
 from shapes import Circle, Rectangle
-from config import ORIGIN_X, ORIGIN_Y
+from config import ORIGIN_X, ORIGIN_Y, COLLISION_BATCH_MIN_OBSTACLES, SPATIAL_INDEX_MIN_OBSTACLES, SPATIAL_INDEX_CELL_SIZE_CM, SCREEN_CALIBRATION_FILE
 
 class TesterInformation:
     def __init__(self, name, lastname, phone_number, age, dominant_hand, vision, test_type, additional_info):
@@ -31,34 +34,108 @@ class TabletData:
     def copy(self):
         return TabletData(self.x, self.y, self.pressure, self.x_tilt, self.y_tilt, self.rotation, self.time)
 
+@dataclass(frozen=True)
 class ScreenDimensions:
-    def __init__(self, app: QApplication):
+    """
+    Immutable geometry profile of the screen: size in pixels and cm and the conversion factors between them.
+
+    Attributes:
+        WINDOW_WIDTH_PIXELS (int): Width of the screen in pixels.
+        WINDOW_HEIGHT_PIXELS (int): Height of the screen in pixels.
+        WINDOW_WIDTH_CM (float): Physical width of the screen in cm.
+        WINDOW_HEIGHT_CM (float): Physical height of the screen in cm.
+    """
+    WINDOW_WIDTH_PIXELS: int
+    WINDOW_HEIGHT_PIXELS: int
+    WINDOW_WIDTH_CM: float
+    WINDOW_HEIGHT_CM: float
+    X_CM_TO_PIXEL: float = field(init=False)
+    Y_CM_TO_PIXEL: float = field(init=False)
+    X_PIXEL_TO_CM: float = field(init=False)
+    Y_PIXEL_TO_CM: float = field(init=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, 'X_CM_TO_PIXEL', self.WINDOW_WIDTH_PIXELS / self.WINDOW_WIDTH_CM)
+        object.__setattr__(self, 'Y_CM_TO_PIXEL', self.WINDOW_HEIGHT_PIXELS / self.WINDOW_HEIGHT_CM)
+        object.__setattr__(self, 'X_PIXEL_TO_CM', self.WINDOW_WIDTH_CM / self.WINDOW_WIDTH_PIXELS)
+        object.__setattr__(self, 'Y_PIXEL_TO_CM', self.WINDOW_HEIGHT_CM / self.WINDOW_HEIGHT_PIXELS)
+
+    @classmethod
+    def from_screen(cls, app: QApplication) -> 'ScreenDimensions':
+        """Queries the geometry of the primary screen."""
         screen = app.primaryScreen()
-    
         screen_resolution = screen.geometry()
-        self.WINDOW_WIDTH_PIXELS = screen_resolution.width()
-        self.WINDOW_HEIGHT_PIXELS = screen_resolution.height() 
+        physical_size_mm = screen.physicalSize()
+        return cls(screen_resolution.width(), screen_resolution.height(), physical_size_mm.width() / 10, physical_size_mm.height() / 10)
+
+    @classmethod
+    def from_size(cls, width_pixels: int, height_pixels: int, width_cm: float, height_cm: float) -> 'ScreenDimensions':
+        """Creates screen dimensions from explicit geometry, without querying a QApplication."""
+        return cls(width_pixels, height_pixels, width_cm, height_cm)
+
+    @classmethod
+    def load(cls, path: str) -> 'ScreenDimensions':
+        """Loads a calibration file written by `save`."""
+        with open(path) as file:
+            values = json.load(file)
+        return cls(values['width_pixels'], values['height_pixels'], values['width_cm'], values['height_cm'])
+
+    def save(self, path: str) -> None:
+        """Saves the geometry as a calibration file, e.g. after measuring the physical size of the screen."""
+        values = {
+            'width_pixels': self.WINDOW_WIDTH_PIXELS,
+            'height_pixels': self.WINDOW_HEIGHT_PIXELS,
+            'width_cm': self.WINDOW_WIDTH_CM,
+            'height_cm': self.WINDOW_HEIGHT_CM,
+        }
+        with open(path, 'w') as file:
+            json.dump(values, file, indent=4)
+
+    def with_height_offset(self, offset_pixels: int) -> 'ScreenDimensions':
+        """Returns the geometry of a window `offset_pixels` shorter than this one, with the same conversion factors."""
+        height_pixels = self.WINDOW_HEIGHT_PIXELS - offset_pixels
+        return ScreenDimensions(self.WINDOW_WIDTH_PIXELS, height_pixels, self.WINDOW_WIDTH_CM, height_pixels * self.Y_PIXEL_TO_CM)
 
-        physical_size_mm = screen.physicalSize()  
-        self.WINDOW_WIDTH_CM = physical_size_mm.width() / 10
-        self.WINDOW_HEIGHT_CM = physical_size_mm.height() / 10
 
-        self.X_CM_TO_PIXEL = self.WINDOW_WIDTH_PIXELS / self.WINDOW_WIDTH_CM
-        self.Y_CM_TO_PIXEL = self.WINDOW_HEIGHT_PIXELS / self.WINDOW_HEIGHT_CM
-        self.X_PIXEL_TO_CM = self.WINDOW_WIDTH_CM / self.WINDOW_WIDTH_PIXELS
-        self.Y_PIXEL_TO_CM = self.WINDOW_HEIGHT_CM / self.WINDOW_HEIGHT_PIXELS
+_screen_dimensions = None
+
+
+def get_screen_dimensions() -> ScreenDimensions:
+    """
+    Returns the screen geometry of the session.
+
+    It is loaded from `SCREEN_CALIBRATION_FILE` if that file exists, otherwise queried once from
+    the primary screen of the running QApplication.
+    """
+    global _screen_dimensions
+    if _screen_dimensions is None:
+        if os.path.exists(SCREEN_CALIBRATION_FILE):
+            _screen_dimensions = ScreenDimensions.load(SCREEN_CALIBRATION_FILE)
+        else:
+            _screen_dimensions = ScreenDimensions.from_screen(QApplication.instance())
+    return _screen_dimensions
 
 
 class Data:
-    def __init__(self, time_to_finish, rate, source, dest, circles, rects, y_offset_change_pixels=75, passing_offset=OFFSET_FROM_DEST_CM):
-        self.dimensions = ScreenDimensions(QApplication.instance())
-        self.dimensions.WINDOW_HEIGHT_PIXELS -= y_offset_change_pixels
-        self.dimensions.WINDOW_HEIGHT_CM = self.dimensions.WINDOW_HEIGHT_PIXELS * self.dimensions.Y_PIXEL_TO_CM
+    def __init__(self, time_to_finish, rate, source, dest, circles, rects, y_offset_change_pixels=75, passing_offset=OFFSET_FROM_DEST_CM, dimensions=None):
+        from collision import CollisionEngine      # pulls in numpy, not needed before the first trial
+
+        # Explicit dimensions allow building trials without a QApplication, e.g. for replays
+        if dimensions is None:
+            dimensions = get_screen_dimensions()
+        self.dimensions = dimensions.with_height_offset(y_offset_change_pixels)
         
         self.source_circle = self.process_input_circle_data(source, SOURCE_CIRCLE_COLOR)
         self.dest_circle = self.process_input_circle_data(dest, DESTINATION_CIRCLE_COLOR)
         self.middle_circles = [self.process_input_circle_data(circle, MIDDLE_CIRCLE_COLOR) for circle in circles]
         self.rects = [self.process_input_rect_data(rect) for rect in rects]
+        # A few obstacles are tested faster one by one than through the overhead of small NumPy calls
+        num_obstacles = len(self.middle_circles) + len(self.rects)
+        self.collision_engine = None
+        if num_obstacles >= COLLISION_BATCH_MIN_OBSTACLES:
+            use_spatial_index = num_obstacles >= SPATIAL_INDEX_MIN_OBSTACLES
+            cell_size = SPATIAL_INDEX_CELL_SIZE_CM * self.dimensions.X_CM_TO_PIXEL if use_spatial_index else None
+            self.collision_engine = CollisionEngine(self.middle_circles, self.rects, cell_size)
         self.time_to_finish = time_to_finish
         self.rate = rate
         self.passing_offset = passing_offset
@@ -107,39 +184,69 @@ class Data:
         return Rectangle(x, y, w, h)
 
 
+    def check_end(self, x, y, t) -> bool:
+        """Checks if the test should end based on input conditions."""
+        dest = self.dest_circle
+        if t >= self.time_to_finish:
+            return True
+        if self.state.dest_hit:
+            return True
+        if x - (dest.x + dest.rx) >= self.passing_offset * self.dimensions.X_CM_TO_PIXEL:
+            self.state.dest_passed = 1
+            return True
+        return False
+
+    def determine_status(self) -> bool:
+        """Determines the success status of the test."""
+        if self.state.time > self.time_to_finish:
+            return False
+        if not self.state.dest_hit:
+            return False
+        if any(not hit for hit in self.state.circles_hit):
+            return False
+        if any(self.state.rects_hit):
+            return False
+        return True
+
     def process_input_data(self, tablet_data, t):
         x, y = tablet_data[0], tablet_data[1]
 
         # check collusions
         self.state.source_hit |= self.source_circle.check_hit(x, y)
         self.state.dest_hit |= self.dest_circle.check_hit(x, y)
-        if not self.state.dest_hit and len(self.state.points) > 1:
-            self.dest_circle.check_hit_line_segment(x, y, *self.state.points[-1][:2])
-        
-        for i in range(len(self.middle_circles)):
-            self.state.circles_hit[i] |= self.middle_circles[i].check_hit(x, y)
-            if not self.state.circles_hit[i] and len(self.state.points) > 1:
-                self.state.circles_hit[i] |= self.middle_circles[i].check_hit_line_segment(x, y, *self.reverse_process_x_and_y_for_record(*self.state.points[-1][:2]))
 
-        for i in range(len(self.rects)):
-            self.state.rects_hit[i] |= self.rects[i].check_hit(x, y) 
-            if not self.state.rects_hit[i] and len(self.state.points) > 1:
-                self.state.rects_hit[i] |= self.rects[i].check_hit_line_segments(x, y, *self.reverse_process_x_and_y_for_record(*self.state.points[-1][:2]))
-                pass
+        prev = self.state.last_position if len(self.state.points) > 1 else None
+        if self.collision_engine is not None:
+            circles_hit, rects_hit = self.collision_engine.hit_indices(x, y, prev)
+            for i in circles_hit:
+                self.state.circles_hit[i] = 1
+            for i in rects_hit:
+                self.state.rects_hit[i] = 1
+        else:
+            for i, circle in enumerate(self.middle_circles):
+                if not self.state.circles_hit[i] and (circle.check_hit(x, y) or prev is not None and circle.check_hit_line_segment(x, y, *prev)):
+                    self.state.circles_hit[i] = 1
+            for i, rect in enumerate(self.rects):
+                if not self.state.rects_hit[i] and (rect.check_hit(x, y) or prev is not None and rect.check_hit_line_segments(x, y, *prev)):
+                    self.state.rects_hit[i] = 1
+        self.state.last_position = (x, y)
 
-        tablet_data[0], tablet_data[1] = self.process_x_and_y_for_record(x, y)
-        self.state.points.append((*tablet_data, t))
+        record_x, record_y = self.process_x_and_y_for_record(x, y)
+        self.state.points.append(record_x, record_y, *tablet_data[2:7], t)
 
 
 class State: 
     def __init__(self, data:Data):
+        from sample_buffer import SampleBuffer      # pulls in numpy, not needed before the first trial
+
         self.source_hit = 0
         self.dest_hit = 0
         self.circles_hit = [0] * len(data.middle_circles)
         self.rects_hit = [0] * len(data.rects)
         
         self.time = None
-        self.points = []
+        self.points = SampleBuffer(min(int(data.rate * data.time_to_finish / 1000) + 64, 1 << 16))
+        self.last_position = None       # last sample in pixels, for segment hit tests
         self.dest_passed = 0
         self.success_status = 0
 
@@ -0,0 +1,199 @@
+import os
+import json
+import argparse
+import numpy as np
+from config import COMPILED_TRIAL_SET_FILE_NAME, GENERATED_MANIFEST_FILE_NAME
+from trial_set import TrialSet, NO_SOURCES, RECT_DATA_SIZE
+
+# Defaults of the MATLAB scripts in raw_data/
+SAMPLE_RATE = 100                   # Hz
+SEQUENCE_LENGTH = 1200              # samples, 12 s
+AMPLITUDE_X = 5                     # cm
+AMPLITUDE_Y = 8.84                  # cm
+PINK_FILTER_POLE = 0.99             # filter(1, [1 -0.99])
+
+# Defaults of the generated trials
+TRIALS_PER_BLOCK = 20
+TIME_TO_FINISH = 2000               # ms
+RATE = 200                          # Hz
+SOURCE_CIRCLE = (-18, 0, 0.5)       # x, y, r in cm
+DEST_CIRCLE = (10, 0, 0.5)
+OBSTACLE_RADIUS = 0.5               # cm
+OBSTACLE_RECT_SIZE = (1, 1)         # w, h in cm
+
+FILTER_CHUNK_SIZE = 256
+
+
+def white_noise(rng: np.random.Generator, num_sequences: int, length: int) -> np.ndarray:
+    """Returns a (sequences, length) array of standard normal white noise."""
+    return rng.standard_normal((num_sequences, length))
+
+
+def pink_noise_filter(white: np.ndarray, pole: float = PINK_FILTER_POLE) -> np.ndarray:
+    """
+    Approximates pink noise like MATLAB's `filter(1, [1 -pole], white)`, along the last axis.
+
+    The recursion `y[n] = x[n] + pole * y[n - 1]` is solved in closed form within chunks of
+    `FILTER_CHUNK_SIZE` samples, for all sequences at once, and carried over between chunks.
+    """
+    pink = np.empty_like(white, dtype=float)
+    powers = pole ** np.arange(FILTER_CHUNK_SIZE + 1)
+    carry = np.zeros(white.shape[:-1])
+    for start in range(0, white.shape[-1], FILTER_CHUNK_SIZE):
+        chunk = white[..., start:start + FILTER_CHUNK_SIZE]
+        n = chunk.shape[-1]
+        # y[k] = pole^k * (carry * pole + sum_{j <= k} x[j] * pole^-j)
+        scaled = np.cumsum(chunk / powers[:n], axis=-1)
+        pink[..., start:start + n] = powers[:n] * (scaled + carry[..., None] * pole)
+        carry = pink[..., start + n - 1]
+    return pink
+
+
+def pink_noise_spectral(rng: np.random.Generator, num_sequences: int, length: int, exponent: float = 1) -> np.ndarray:
+    """Returns (sequences, length) noise with a 1/f^exponent power spectrum, shaped in the frequency domain."""
+    spectrum = np.fft.rfft(white_noise(rng, num_sequences, length), axis=-1)
+    frequencies = np.fft.rfftfreq(length)
+    scale = np.zeros_like(frequencies)
+    scale[1:] = frequencies[1:] ** (-exponent / 2)
+    return np.fft.irfft(spectrum * scale, n=length, axis=-1)
+
+
+def band_pass(signals: np.ndarray, sample_rate: float, low: float, high: float) -> np.ndarray:
+    """Keeps the frequencies between `low` and `high` Hz of each sequence, with an ideal FFT filter."""
+    spectrum = np.fft.rfft(signals, axis=-1)
+    frequencies = np.fft.rfftfreq(signals.shape[-1], d=1 / sample_rate)
+    spectrum[..., (frequencies < low) | (frequencies > high)] = 0
+    return np.fft.irfft(spectrum, n=signals.shape[-1], axis=-1)
+
+
+def normalize(signals: np.ndarray, amplitude: float) -> np.ndarray:
+    """Scales each sequence so its largest absolute value is `amplitude`."""
+    return signals / np.abs(signals).max(axis=-1, keepdims=True) * amplitude
+
+
+def generate_sequences(kind: str, num_sequences: int, length: int = SEQUENCE_LENGTH, seed=None, method: str = 'filter',
+                       band: tuple[float, float] | None = None, sample_rate: float = SAMPLE_RATE) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Generates seeded x and y noise sequences, like the MATLAB scripts in raw_data/.
+
+    Args:
+        kind (str): 'pink' or 'white'.
+        num_sequences (int): Number of sequences, all generated at once.
+        length (int): Number of samples in each sequence.
+        seed: Seed of the random generator.
+        method (str): How pink noise is made: 'filter' for the `filter(1, [1 -0.99])`
+            approximation, 'spectral' for 1/f shaping in the frequency domain.
+        band (tuple[float, float] | None): Optional pass band in Hz, applied before normalizing.
+        sample_rate (float): Sample rate of the sequences in Hz, for the pass band.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (sequences, length) arrays of x and y in cm, scaled to
+        `AMPLITUDE_X` and `AMPLITUDE_Y`.
+    """
+    rng = np.random.default_rng(seed)
+    if kind == 'white':
+        signals = white_noise(rng, 2 * num_sequences, length)
+    elif kind == 'pink' and method == 'filter':
+        signals = pink_noise_filter(white_noise(rng, 2 * num_sequences, length))
+    elif kind == 'pink' and method == 'spectral':
+        signals = pink_noise_spectral(rng, 2 * num_sequences, length)
+    else:
+        raise ValueError(f"Unknown noise kind or method: {kind}, {method}")
+
+    if band is not None:
+        signals = band_pass(signals, sample_rate, *band)
+    ys, xs = signals[:num_sequences], signals[num_sequences:]
+    return normalize(xs, AMPLITUDE_X), normalize(ys, AMPLITUDE_Y)
+
+
+def sequence_to_trial_set(xs: np.ndarray, ys: np.ndarray, shape: str = 'circle', time_to_finish: int = TIME_TO_FINISH,
+                          rate: int = RATE, source: tuple = SOURCE_CIRCLE, dest: tuple = DEST_CIRCLE,
+                          radius: float = OBSTACLE_RADIUS, rect_size: tuple = OBSTACLE_RECT_SIZE) -> TrialSet:
+    """
+    Turns a noise sequence into a block with one obstacle per trial, centered on each (x, y) sample.
+
+    Args:
+        xs (np.ndarray): x of the obstacle in each trial, in cm.
+        ys (np.ndarray): y of the obstacle in each trial, in cm.
+        shape (str): 'circle' for middle circles of `radius`, 'rect' for rectangles of `rect_size`.
+    """
+    num_trials = len(xs)
+    general = np.tile(np.array([time_to_finish, rate, *source, *dest], dtype=float), (num_trials, 1))
+    ones, zeros = np.ones(num_trials, dtype=int), np.zeros(num_trials, dtype=int)
+    if shape == 'circle':
+        circles = np.stack([xs, ys, np.full(num_trials, radius)], axis=-1)[:, None]
+        return TrialSet(general, circles, ones, np.zeros((num_trials, 0, RECT_DATA_SIZE)), zeros)
+    if shape == 'rect':
+        # Rectangles are given by their top-left corner
+        w, h = rect_size
+        rects = np.stack([xs - w / 2, ys + h / 2, np.full(num_trials, w), np.full(num_trials, h)], axis=-1)[:, None]
+        return TrialSet(general, np.zeros((num_trials, 0, 3)), zeros, rects, ones)
+    raise ValueError(f"Unknown obstacle shape: {shape}")
+
+
+def write_blocks(xs: np.ndarray, ys: np.ndarray, output_dir: str, num_trials: int = TRIALS_PER_BLOCK,
+                 generation: dict | None = None, **layout) -> list[str]:
+    """
+    Writes one compiled trial set per sequence to `<output_dir>/<block number>/`, ready for the test.
+
+    The first `num_trials` samples of each sequence become the trials of its block. Compiled
+    trial sets are not kept in version control, so if the `generate_sequences` arguments that
+    made the sequences are given, they are written next to each block as a manifest from which
+    `regenerate_block` rebuilds it.
+
+    Returns:
+        list[str]: Paths of the written trial set files.
+    """
+    paths = []
+    for block, (x, y) in enumerate(zip(xs, ys), start=1):
+        directory = os.path.join(output_dir, str(block))
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, COMPILED_TRIAL_SET_FILE_NAME)
+        sequence_to_trial_set(x[:num_trials], y[:num_trials], **layout).save(path, NO_SOURCES)
+        if generation is not None:
+            manifest = {**generation, 'block': block, 'num_blocks': len(xs), 'num_trials': num_trials, 'layout': layout}
+            with open(os.path.join(directory, GENERATED_MANIFEST_FILE_NAME), 'w') as file:
+                json.dump(manifest, file, indent=4)
+        paths.append(path)
+    return paths
+
+
+def regenerate_block(directory: str) -> TrialSet:
+    """Rebuilds and saves the compiled trial set of a generated block from its manifest."""
+    with open(os.path.join(directory, GENERATED_MANIFEST_FILE_NAME)) as file:
+        manifest = json.load(file)
+    band = tuple(manifest['band']) if manifest['band'] is not None else None
+    xs, ys = generate_sequences(manifest['kind'], manifest['num_blocks'], manifest['length'], manifest['seed'], manifest['method'], band)
+    block, num_trials = manifest['block'] - 1, manifest['num_trials']
+    layout = {name: tuple(value) if isinstance(value, list) else value for name, value in manifest['layout'].items()}
+    trial_set = sequence_to_trial_set(xs[block][:num_trials], ys[block][:num_trials], **layout)
+    trial_set.save(os.path.join(directory, COMPILED_TRIAL_SET_FILE_NAME), NO_SOURCES)
+    print(f"Generated trial set rebuilt at: {os.path.join(directory, COMPILED_TRIAL_SET_FILE_NAME)}")
+    return trial_set
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate blocks of trials from pink or white noise.")
+    parser.add_argument('kind', choices=('pink', 'white'))
+    parser.add_argument('output_dir', help="directory of the test type, e.g. data/P3")
+    parser.add_argument('--blocks', type=int, default=1, help="number of blocks, one noise sequence each")
+    parser.add_argument('--trials', type=int, default=TRIALS_PER_BLOCK, help="number of trials per block")
+    parser.add_argument('--length', type=int, default=SEQUENCE_LENGTH, help="samples per noise sequence")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--method', choices=('filter', 'spectral'), default='filter', help="how pink noise is made")
+    parser.add_argument('--band', nargs=2, type=float, metavar=('LOW', 'HIGH'), help="pass band in Hz, e.g. 0.1 45")
+    parser.add_argument('--shape', choices=('circle', 'rect'), default='circle', help="obstacle shape")
+    args = parser.parse_args()
+
+    # Without a seed one is drawn and recorded, so the blocks can always be regenerated
+    seed = args.seed if args.seed is not None else np.random.SeedSequence().entropy
+    generation = {
+        'kind': args.kind, 'length': max(args.length, args.trials), 'seed': seed, 'method': args.method, 'band': args.band
+    }
+    xs, ys = generate_sequences(args.kind, args.blocks, generation['length'], seed, args.method, args.band)
+    paths = write_blocks(xs, ys, args.output_dir, args.trials, generation, shape=args.shape)
+    print(f"{len(paths)} blocks of {args.trials} trials written to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
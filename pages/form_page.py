@@ -17,8 +17,7 @@ class FormPage(QWidget):
 	def __init__(self, main_window):
 		super().__init__()
 		self.main_window = main_window
-		self.dimensions = main_window.dimensions
-		self.dimensions.WINDOW_HEIGHT_PIXELS -= 100
+		self.dimensions = main_window.dimensions.with_height_offset(100)
 		self.setWindowTitle("Form Page")
 		self.setFixedSize(self.dimensions.WINDOW_WIDTH_PIXELS, self.dimensions.WINDOW_HEIGHT_PIXELS)
 		# self.setGeometry(0, 0, self.dimensions.WINDOW_WIDTH_PIXELS, self.dimensions.WINDOW_HEIGHT_PIXELS)
@@ -1,23 +1,31 @@
 import time
 import threading
-import csv
-from queue import Queue
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from PyQt6.QtCore import QTimer, QObject, pyqtSignal, QEvent
-from PyQt6.QtGui import QCursor, QPainter, QColor, QPen, QTabletEvent
+from PyQt6.QtGui import QCursor, QPainter, QColor, QPen, QTabletEvent, QPixmap, QPolygon
 from PyQt6.QtWidgets import QWidget
 from models import Data, TabletData
+from sampling import Sampler, SampleQueue
+from trial_set import TrialSet
+from recorder import TrialRecorder, trial_csv_header
+from results_store import BlockResultWriter
+from audio import get_cue_player
+from telemetry import TrialTelemetry
+from tablet_timing import RawEventBuffer, align_event_times, resample_events
+from sample_buffer import SAMPLE_FIELDS, to_rows
 from config import (
 	BACKGROUND_COLOR, SOURCE_CIRCLE_COLOR, DESTINATION_CIRCLE_COLOR, RECT_COLOR,
-	SUCCESS_PATH_COLOR, FAILURE_PATH_COLOR, START_FREQUENCY, START_DURATION_MS,
-	SUCCESS_FREQUENCY, SUCCESS_DURATION_MS, FAILURE_FREQUENCY, FAILURE_DURATION_MS, 
-	DELAY_BETWEEN_TESTS, MAX_NUM_OF_ADDITIONAL_RCORDED_POINTS
+	SUCCESS_PATH_COLOR, FAILURE_PATH_COLOR, LIVE_PATH_COLOR, DELAY_BETWEEN_TESTS, MAX_NUM_OF_ADDITIONAL_RCORDED_POINTS,
+	LIVE_PATH_PREVIEW, PREFETCH_TRIALS, TELEMETRY, TELEMETRY_SUFFIX, WRITE_RESAMPLED, RESAMPLED_SUFFIX,
+	RAW_CAPTURE, RAW_CAPTURE_SUFFIX
 )
 from PyQt6.QtWidgets import QLabel, QVBoxLayout, QWidget
-from PyQt6.QtCore import Qt
-import sounddevice as sd
-import numpy as np
+from PyQt6.QtCore import Qt, QPoint
 import os
+import csv
+import numpy as np
 
 ######################################################################################
 #                                                                                    #
@@ -28,113 +36,121 @@ import os
 class PageManager(QObject):
 	"""Manages the test progression and navigation between pages."""
 	start_test_signal = pyqtSignal(Data)
+	trial_completed_signal = pyqtSignal(int)
 	finished_signal = pyqtSignal()
 
-	def __init__(self, file_path: str):
+	def __init__(self, trial_set: TrialSet, result_writer: BlockResultWriter | None = None, start_test_number: int = 1, dimensions=None):
 		super().__init__()
-		self.file_path = file_path
+		self.trial_set = trial_set
+		self.result_writer = result_writer
+		self.start_test_number = start_test_number
+		self.dimensions = dimensions			# screen geometry of the trials, the session's one if None
 		self.test_number = 0
 		self.data_generator = self._data_generator_function()
 
-	def _data_generator_function(self):
-		"""Generator function to read test data from a CSV file."""
-		from config import INDEX_OF_START_TEST
-		with open(self.file_path, 'r') as file:
-			csv_reader = csv.reader(file)
-			for row in csv_reader:
-				self.test_number += 1
-				if self.test_number < INDEX_OF_START_TEST:
-					continue
-				yield self._parse_row(row)
-
-	def _parse_row(self, row: list) -> Data:
-		"""Parses a row of CSV data into a Data object."""
-		data = [float(x) for x in row]
-		time, rate = int(data[0]), int(data[1])
-		circle_size = 3
-		rectangle_size = 4
-
-		source_circle = tuple(data[2:2 + circle_size])
-		dest_circle = tuple(data[2 + circle_size:2 + 2 * circle_size])
-
-		index = 2 + 2 * circle_size
-		num_middle_circles = int(data[index])
-		middle_circles = [
-			tuple(data[i:i + circle_size])
-			for i in range(index + 1, index + 1 + num_middle_circles * circle_size, circle_size)
-		]
-
-		index += 1 + num_middle_circles * circle_size
-		num_rectangles = int(data[index])
-		rectangles = [
-			tuple(data[i:i + rectangle_size])
-			for i in range(index + 1, index + 1 + num_rectangles * rectangle_size, rectangle_size)
-		]
+		# Trials are built ahead of time on a worker thread, while the previous one is shown
+		self.prefetched = deque()				# futures of (test number, data), in test order
+		self.prefetch_executor = ThreadPoolExecutor(max_workers=1)
+		self.trial_end_ns = None
+		self.inter_trial_intervals_ms = []
 
-		return Data(time, rate, source_circle, dest_circle, middle_circles, rectangles, 75)
+	def _data_generator_function(self):
+		"""Generator function to build the test data of each trial in the trial set."""
+		test_number = 0
+		for index in range(len(self.trial_set)):
+			test_number += 1
+			if test_number < self.start_test_number:
+				continue
+			yield test_number, self._create_data(index)
+
+	def _create_data(self, index: int) -> Data:
+		"""Creates the Data object of a trial in the trial set."""
+		time, rate, source_circle, dest_circle, middle_circles, rectangles = self.trial_set.trial(index)
+		return Data(time, rate, source_circle, dest_circle, middle_circles, rectangles, 75, dimensions=self.dimensions)
+
+	def _next_data(self):
+		"""Returns the next test number and data from the generator, or None after the last trial."""
+		return next(self.data_generator, None)
+
+	def prefetch(self):
+		"""Queues the building of the next trials, up to `PREFETCH_TRIALS` ahead."""
+		while len(self.prefetched) < PREFETCH_TRIALS:
+			self.prefetched.append(self.prefetch_executor.submit(self._next_data))
 
 	def start_tests(self):
 		"""Starts the test sequence."""
+		self.prefetch()
 		self.next_test()
 
+	def trial_finished(self):
+		"""Prepares the next trials during the delay between tests and starts the next one after it."""
+		self.trial_end_ns = time.perf_counter_ns()
+		self.trial_completed_signal.emit(self.test_number)
+		self.prefetch()
+		QTimer.singleShot(DELAY_BETWEEN_TESTS, self.next_test)
+
 	def next_test(self):
-		try:
-			data = next(self.data_generator)
-			self.start_test_signal.emit(data)
-		except StopIteration:
+		if not self.prefetched:
+			self.prefetch()
+		next_trial = self.prefetched.popleft().result()
+		if next_trial is None:
+			self.prefetch_executor.shutdown(wait=False, cancel_futures=True)
 			self.finished_signal.emit()
+			return
 
+		self.test_number, data = next_trial
+		self.start_test_signal.emit(data)
+		if self.trial_end_ns is not None:
+			interval_ms = (time.perf_counter_ns() - self.trial_end_ns) / 1e6
+			self.inter_trial_intervals_ms.append(interval_ms)
+			print(f"Inter-trial interval: {interval_ms:.0f} ms (configured {DELAY_BETWEEN_TESTS} ms)")
 
 
-def play_beep(frequency: float, duration: float):
-	# Generate a sine wave
-	sample_rate = 44100  # Samples per second (standard for audio)
-	t = np.linspace(0, duration, int(sample_rate * duration), False)
-	audio = np.sin(2 * np.pi * frequency * t)
-
-	# Play the audio
-	sd.play(audio, samplerate=sample_rate)
-	sd.wait()
 
 class TestPage(QWidget):
-	"""Handles a single test, managing input, drawing, and logic."""
+	"""Handles the tests of a block, managing input, drawing, and logic. The page is reused for each trial."""
 	def __init__(self, data: Data, target_dir: str, target_file_prefix: str, manager: PageManager):
 		super().__init__()
-		self.data = data
-		self.state = self.data.state
 		self.manager = manager
 		self.target_dir = target_dir
 		self.target_file_prefix = target_file_prefix
 		self.is_running = False
+		self.closed = False
+		self.input_source = None			# replaces the tablet and mouse if set, e.g. a SimulatedPen
 
-		self.sampling_rate_ms = 1000 / self.data.rate
-		self.read_queue = Queue(maxsize=10000)
+		self.read_queue = SampleQueue(maxsize=10000)
+		# Every tablet event of the trial, written by the GUI thread only. None if no output needs them
+		self.raw_events = RawEventBuffer() if WRITE_RESAMPLED or RAW_CAPTURE else None
 		self.tablet_data_times = []
+		self.switch_start_ns = None
+		self.switch_times_ms = []
 
-		self.start_time = 0
-		self.tablet_data = None
-		self.tablet_connected = False
-		self.path_color = FAILURE_PATH_COLOR
-		self.show_path_flag = False
+		self.preview_timer = QTimer(self)
+		self.preview_timer.timeout.connect(self.draw_live_path)
 
-		self.setFixedSize(self.data.dimensions.WINDOW_WIDTH_PIXELS, self.data.dimensions.WINDOW_HEIGHT_PIXELS)
 		self.setWindowTitle("Circles Display")
 		
 		self.init_ui()
 		
-		self.reading_thread = threading.Thread(target=self.read_data)
-		self.processing_thread = threading.Thread(target=self.process_data)
-  
-		self.start_beep_thread = threading.Thread(target=play_beep, args=(START_FREQUENCY, START_DURATION_MS))
-		self.success_beep_thread = threading.Thread(target=play_beep, args=(SUCCESS_FREQUENCY, SUCCESS_DURATION_MS))
-		self.failure_beep_thread = threading.Thread(target=play_beep, args=(FAILURE_FREQUENCY, FAILURE_DURATION_MS))
+		# The worker threads live as long as the page and wait for the start of each trial
+		self.reading_start = threading.Event()
+		self.processing_start = threading.Event()
+		self.reading_thread = threading.Thread(target=self.read_data, daemon=True)
+		self.processing_thread = threading.Thread(target=self.process_data, daemon=True)
+		self.reading_thread.start()
+		self.processing_thread.start()
+
+		self.cue_player = get_cue_player()
+		self.cue_player.start()
+
+		self.load_trial(data)
 	
 	def init_ui(self):
 		layout = QVBoxLayout()
 		layout.addStretch()
 
 		# Create a QLabel for the test number at the bottom
-		self.test_number_label = QLabel(f"Test Number: {self.manager.test_number}")
+		self.test_number_label = QLabel()
 		self.test_number_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
 
 		# Style the label to make it small and subtle
@@ -146,12 +162,48 @@ class TestPage(QWidget):
 
 		layout.addWidget(self.test_number_label, alignment=Qt.AlignmentFlag.AlignBottom | Qt.AlignmentFlag.AlignHCenter)
 		self.setLayout(layout)
+
+	def load_trial(self, data: Data):
+		"""Resets the page for a new trial. The time until the trial is painted is reported as the switch time."""
+		self.switch_start_ns = time.perf_counter_ns()
+		self.preview_timer.stop()
+
+		self.data = data
+		self.state = self.data.state
+		self.is_running = False
+		self.sampler = Sampler(self.data.rate, self.sample_input)
+		self.read_queue.reset()
+
+		self.start_time = 0
+		self.end_latency_ns = None
+		self.tablet_data = None
+		self.tablet_connected = False
+		if self.raw_events is not None:
+			self.raw_events.reset()
+		self.path_color = FAILURE_PATH_COLOR
+		self.show_path_flag = False
+		self.scene_cache = None
+		self.path_cache = None
+		self.live_cache = None
+		self.live_drawn = 0
+		self.live_frame_times_ms = []
+		self.telemetry = TrialTelemetry() if TELEMETRY else None
+
+		self.setFixedSize(self.data.dimensions.WINDOW_WIDTH_PIXELS, self.data.dimensions.WINDOW_HEIGHT_PIXELS)
+		self.test_number_label.setText(f"Test Number: {self.manager.test_number}")
+		self.update()
+
+	def close_workers(self):
+		"""Stops the worker threads once the block is over."""
+		self.closed = True
+		self.reading_start.set()
+		self.processing_start.set()
 		
 	def tabletEvent(self, event: QTabletEvent):
 		"""Handles tablet input events."""
 		# threading.Thread(target=self.tablet_, args=(event, time.perf_counter_ns())).start()
-		# current_time = time.perf_counter_ns()
-		self.tablet_data = [
+		arrival_time = time.perf_counter_ns()
+		self.tablet_data = (
 			event.position().x(),
 			event.position().y(),
 			event.pressure(),
@@ -159,7 +211,9 @@ class TestPage(QWidget):
 			event.yTilt(),
 			event.rotation(),
 			event.timestamp()
-		]
+		)
+		if self.raw_events is not None:
+			self.raw_events.append(*self.tablet_data, arrival_time)
 		
 		if not self.start_time and event.type() == QEvent.Type.TabletPress and self.data.source_circle.check_hit(event.position().x(), event.position().y()):
 			self.tablet_connected = True
@@ -177,106 +231,113 @@ class TestPage(QWidget):
 		self.start_time = time.perf_counter_ns()
 		self.is_running = True
 
-		self.reading_thread.start()
-		self.processing_thread.start()
-		self.start_beep_thread.start()
+		self.recorder = TrialRecorder(Path(self.target_dir) / f"{self.target_file_prefix}_{self.manager.test_number}.csv")
+		self.recorder.start()
+		self.reading_start.set()
+		self.processing_start.set()
+		self.cue_player.play('start', self.manager.test_number)
+		if LIVE_PATH_PREVIEW:
+			self.start_live_preview()
 		
 
 	def read_data(self):
-		"""Reads input data from the mouse or tablet at regular intervals."""
-		last_sample_time = self.start_time
-		while self.is_running:
-			current_time = time.perf_counter_ns()
-			if current_time - last_sample_time > self.sampling_rate_ms * 1e6:
-				last_sample_time = current_time
-				if self.tablet_connected:
-					data = self.tablet_data.copy()
-				else:
-					pos = self.mapFromGlobal(QCursor.pos())
-					data = [pos.x(), pos.y(), None, None, None, None, None]
-				elapsed_time = (current_time - self.start_time) / 1e6
-				self.read_queue.put((data, elapsed_time))
+		"""Reads input data from the mouse or tablet at regular intervals during each trial."""
+		while self.reading_start.wait() and not self.closed:
+			self.reading_start.clear()
+			try:
+				self.sampler.run(self.start_time, lambda: self.is_running)
+			finally:
+				self.read_queue.close()
+
+	def sample_input(self, current_time: int):
+		"""Takes a single sample of the current input position, called by the sampler."""
+		elapsed_time = (current_time - self.start_time) / 1e6
+		if self.input_source is not None:
+			data = self.input_source.read(elapsed_time)
+		elif self.tablet_connected:
+			data = self.tablet_data
+		else:
+			pos = self.mapFromGlobal(QCursor.pos())
+			data = (pos.x(), pos.y(), None, None, None, None, None)
+		if self.telemetry is not None:
+			self.telemetry.tick('sample_interval_ns', current_time)
+			self.telemetry.record('queue_depth', len(self.read_queue))
+		self.read_queue.put((data, elapsed_time))
 
 
 	def process_data(self):
-		"""Processes the sampled input data."""
-		while self.is_running:
-			if not self.read_queue.empty():
-				data, t = self.read_queue.get()
-				x, y = data[0], data[1]
-				if self.check_end_test(x, y, t):
-					self.start_stop_thread(t)
-
-				self.data.process_input_data(data, t)
-
-		count = MAX_NUM_OF_ADDITIONAL_RCORDED_POINTS
-		while not self.read_queue.empty() and count > 0:
-			data, t = self.read_queue.get()
+		"""Processes the sampled input data of each trial, then finishes the trial."""
+		while self.processing_start.wait() and not self.closed:
+			self.processing_start.clear()
+			self.process_trial()
+			self.stop_tracking()
+
+	def process_trial(self):
+		"""Processes the sampled input data in batches until the reader closes the queue."""
+		additional_points = None
+		while batch := self.read_queue.get_batch():
+			for data, t in batch:
+				if additional_points is None:
+					x, y = data[0], data[1]
+					end = self.check_end_test(x, y, t)
+					self.process_sample(data, t)
+					if end:
+						self.end_trial(t)
+						additional_points = MAX_NUM_OF_ADDITIONAL_RCORDED_POINTS
+				elif additional_points > 0:
+					self.process_sample(data, t)
+					additional_points -= 1
+
+	def process_sample(self, data, t):
+		"""Runs the collision checks on a sample and hands it to the recorder."""
+		if self.telemetry is None:
+			self.data.process_input_data(data, t)
+		else:
+			start = time.perf_counter_ns()
 			self.data.process_input_data(data, t)
-			count -= 1
+			end = time.perf_counter_ns()
+			self.telemetry.record('process_ns', end - start)
+			# From the sampler tick to the end of processing
+			self.telemetry.record('sample_latency_ns', end - self.start_time - int(t * 1e6))
+		self.recorder.append(self.state.points[-1])
 
 	def check_end_test(self, x, y, t) -> bool:
 		"""Checks if the test should end based on input conditions."""
-		dest = self.data.dest_circle
-		if t >= self.data.time_to_finish:
-			return True
-		if self.data.state.dest_hit:
-			return True
-		if x - (dest.x + dest.rx) >= self.data.passing_offset * self.data.dimensions.X_CM_TO_PIXEL:
-			self.data.state.dest_passed = 1
-			return True
-		return False
-		
-	def start_stop_thread(self, t):
-		self.is_running = False
-		self.stop_thread = threading.Thread(target=self.stop_tracking, args=(t,))
-		self.stop_thread.start()
-			
+		return self.data.check_end(x, y, t)
 
-	def stop_tracking(self, t):
-		print("Tracking stopped!")
+	def end_trial(self, t):
+		"""Stops sampling and determines the status at the sample that ended the test."""
+		self.is_running = False
+		# From the sampler tick of the end sample to the end being detected
+		self.end_latency_ns = time.perf_counter_ns() - self.start_time - int(t * 1e6)
+		if self.telemetry is not None:
+			self.telemetry.record('end_latency_ns', self.end_latency_ns)
 		self.data.state.time = t
 		self.state.success_status = self.determine_status()
 
-		if self.reading_thread.is_alive():
-			self.reading_thread.join() 
-		if self.processing_thread.is_alive():
-			self.processing_thread.join()
+	def stop_tracking(self):
+		"""Shows the outcome and saves the data once the reader has stopped and every sample is processed."""
+		print("Tracking stopped!")
+		print(f"Sampling: {self.sampler}")
 
 		self.path_color = SUCCESS_PATH_COLOR if self.state.success_status else FAILURE_PATH_COLOR
-		if self.state.success_status:
-			self.success_beep_thread.start()
-		else:
-			self.failure_beep_thread.start()
+		self.cue_player.play('success' if self.state.success_status else 'failure', self.manager.test_number)
 
 		self.show_path_flag = True
 		self.update()
 
-		QTimer.singleShot(DELAY_BETWEEN_TESTS, self.manager.next_test)
-  
 		self.save_data()
+		self.manager.trial_finished()
 
 	def determine_status(self) -> bool:
 		"""Determines the success status of the test."""
-		if self.data.state.time > self.data.time_to_finish:
-			return False
-		if not self.data.state.dest_hit:
-			return False
-		if any(not hit for hit in self.data.state.circles_hit):
-			return False
-		if any(self.data.state.rects_hit):
-			return False
-		return True
-
-	def generate_header_and_first_row(self):
-		"""Generates the header and first row for the CSV file."""
-		header = ['x', 'y', 'pressure', 'x_tilt', 'y_tilt', 'rotation', 'tablet_time', 'time', 'total_time', 'success', 'timeout', 'dest_passed', 'source_hit', 'dest_hit']
-		header += [f"circle_{i + 1}_hit" for i in range(len(self.data.state.circles_hit))]
-		header += [f"rect_{i + 1}_hit" for i in range(len(self.data.state.rects_hit))]
-		header += [f'distance of last point from center of dest']
-
-		first_row = [
-			*self.data.state.points[0],
+		return self.data.determine_status()
+
+	def generate_header_and_summary(self):
+		"""Generates the header and the summary fields of the first row for the CSV file."""
+		header = trial_csv_header(len(self.data.state.circles_hit), len(self.data.state.rects_hit))
+
+		summary = [
 			self.data.state.time,
 			int(self.data.state.success_status),
 			int(self.data.state.time > self.data.time_to_finish),
@@ -287,22 +348,89 @@ class TestPage(QWidget):
 			*self.data.state.rects_hit,
 			self.data.dest_circle.calc_dist_to_center(self.data, self.data.state.points[-1][0], self.data.state.points[-1][1])
 		]
-		return header, first_row
+		return header, summary
 
 	def save_data(self):
 		print('saving data...')
-		"""Saves the test data to a CSV file."""
-		output_path = Path(self.target_dir) / f"{self.target_file_prefix}_{self.manager.test_number}.csv"
-		with output_path.open(mode="w", newline="") as file:
+		"""Finalizes the streamed test data with the summary fields."""
+		start = time.perf_counter_ns()
+		header, summary = self.generate_header_and_summary()
+		self.recorder.finish(header, summary)
+		if self.manager.result_writer is not None:
+			state = self.data.state
+			self.manager.result_writer.add_trial(
+				self.manager.test_number, state.points.view(), state.time, int(state.success_status),
+				int(state.time > self.data.time_to_finish), state.dest_passed, state.source_hit, state.dest_hit,
+				state.circles_hit, state.rects_hit, summary[-1]
+			)
+		if WRITE_RESAMPLED and self.tablet_connected:
+			self.save_resampled()
+		if RAW_CAPTURE and self.tablet_connected:
+			self.save_raw_events()
+		if self.telemetry is not None:
+			# The trial file is written on the recorder's thread, wait for it to time the whole save
+			self.recorder.wait()
+			if self.recorder.finalize_ns is not None:
+				self.telemetry.record('finalize_ns', self.recorder.finalize_ns)
+			self.telemetry.record('save_ns', time.perf_counter_ns() - start)
+			self.save_telemetry()
+
+	def save_resampled(self):
+		"""
+		Writes the tablet events of the trial resampled at the trial rate next to its CSV file.
+
+		The samples are interpolated at the sampler's tick times from every tablet event, timed
+		by their hardware timestamps, instead of holding the last event at each tick. The file
+		has the sample columns of the trial CSV file.
+		"""
+		samples = resample_events(self.raw_events.view(), self.start_time, self.data.rate, self.state.points.column('time')[-1])
+		samples['x'], samples['y'] = self.data.process_x_and_y_for_record(samples['x'], samples['y'])
+		path = self.recorder.output_path.with_suffix(RESAMPLED_SUFFIX)
+		with path.open(mode="w", newline="") as file:
 			writer = csv.writer(file)
-			header, first_row = self.generate_header_and_first_row()
-			writer.writerow(header)
-			writer.writerow(first_row)
-			writer.writerows(self.data.state.points[1:])
-
-	def paintEvent(self, event):
-		"""Handles custom painting of the test elements."""
-		painter = QPainter(self)
+			writer.writerow(SAMPLE_FIELDS)
+			writer.writerows(to_rows(samples))
+		print(f"Resampled data saved at: {path}")
+
+	def save_raw_events(self):
+		"""
+		Writes every tablet event of the trial next to its CSV file, at the full rate of the tablet.
+
+		The events start at the one that started the trial. They have the sample columns of the
+		trial CSV file, with the time of each event aligned from its hardware timestamp, followed
+		by the time it reached the page. The scoring only ever sees the sampled trial.
+		"""
+		events = self.raw_events.view()
+		times = (align_event_times(events['event_ms'], events['arrival_ns']) - self.start_time) / 1e6
+		first = max(np.searchsorted(times, 0) - 1, 0)
+		events, times = events[first:], times[first:]
+		xs, ys = self.data.process_x_and_y_for_record(events['x'], events['y'])
+		arrival_times = (events['arrival_ns'] - self.start_time) / 1e6
+		path = self.recorder.output_path.with_suffix(RAW_CAPTURE_SUFFIX)
+		with path.open(mode="w", newline="") as file:
+			writer = csv.writer(file)
+			writer.writerow([*SAMPLE_FIELDS, 'arrival_time'])
+			writer.writerows(zip(
+				xs.tolist(), ys.tolist(), events['pressure'].tolist(), events['x_tilt'].tolist(), events['y_tilt'].tolist(),
+				events['rotation'].tolist(), events['event_ms'].tolist(), times.tolist(), arrival_times.tolist()
+			))
+		print(f"Raw tablet events saved at: {path}")
+
+	def save_telemetry(self):
+		"""Writes the telemetry of the trial next to its CSV file."""
+		self.telemetry.count('samples_taken', self.sampler.num_samples)
+		self.telemetry.count('samples_recorded', len(self.state.points))
+		self.telemetry.count('missed_ticks', self.sampler.missed_ticks)
+		path = self.recorder.output_path.with_suffix(TELEMETRY_SUFFIX)
+		self.telemetry.save(path, test_number=self.manager.test_number, sampler=self.sampler.report())
+		print(f"Telemetry saved at: {path}")
+
+	def build_scene_cache(self) -> QPixmap:
+		"""Renders the background and the static circles and rectangles once into a pixmap."""
+		ratio = self.devicePixelRatioF()
+		pixmap = QPixmap(int(self.width() * ratio), int(self.height() * ratio))
+		pixmap.setDevicePixelRatio(ratio)
+		painter = QPainter(pixmap)
 		painter.fillRect(self.rect(), QColor(*BACKGROUND_COLOR))
 
 		# Draw source, destination, and middle circles
@@ -314,24 +442,92 @@ class TestPage(QWidget):
 		# Draw rectangles
 		for rect in self.data.rects:
 			rect.draw(painter)
+		painter.end()
+		return pixmap
+
+	def build_path_cache(self) -> QPixmap:
+		"""Draws the recorded path, converted with one vectorized transform, over a copy of the scene."""
+		points = self.data.state.points
+		# Draw up to the first point recorded after the end of the test
+		late = np.flatnonzero(points.column('time')[1:] > self.data.state.time)
+		end = late[0] + 1 if len(late) else len(points)
+		xs, ys = self.data.reverse_process_x_and_y_for_record(points.column('x')[:end].copy(), points.column('y')[:end].copy())
+		polyline = QPolygon([QPoint(x, y) for x, y in zip(xs.astype(int).tolist(), ys.astype(int).tolist())])
+
+		pixmap = self.scene_cache.copy()
+		painter = QPainter(pixmap)
+		painter.setPen(QPen(QColor(*self.path_color), 2))
+		painter.drawPolyline(polyline)
+		painter.end()
+		return pixmap
+
+	def start_live_preview(self):
+		"""Starts drawing the pen trail while the test runs, once per display refresh."""
+		if self.scene_cache is None:
+			self.scene_cache = self.build_scene_cache()
+		self.live_cache = self.scene_cache.copy()
+		self.live_drawn = 0
+		self.live_frame_times_ms = []
+		refresh_rate = self.screen().refreshRate() or 60
+		self.preview_timer.start(max(int(1000 / refresh_rate), 1))
+
+	def draw_live_path(self):
+		"""Draws only the segments recorded since the last frame onto the live trail pixmap."""
+		if not self.is_running:
+			self.preview_timer.stop()
+			self.report_live_preview()
+		frame_start = time.perf_counter_ns()
+
+		points = self.data.state.points
+		start = max(self.live_drawn - 1, 0)
+		xs = points.column('x')[start:].copy()
+		ys = points.column('y')[start:].copy()
+		count = min(len(xs), len(ys))
+		if count > 1 or (count and not self.live_drawn):
+			xs, ys = self.data.reverse_process_x_and_y_for_record(xs[:count], ys[:count])
+			polyline = QPolygon([QPoint(x, y) for x, y in zip(xs.astype(int).tolist(), ys.astype(int).tolist())])
+			painter = QPainter(self.live_cache)
+			painter.setPen(QPen(QColor(*LIVE_PATH_COLOR), 2))
+			painter.drawPolyline(polyline)
+			painter.end()
+			self.live_drawn = start + count
+			self.update()
+
+		self.live_frame_times_ms.append((time.perf_counter_ns() - frame_start) / 1e6)
+
+	def report_live_preview(self):
+		"""Prints the frame times of the live preview against the display refresh budget."""
+		frame_times = self.live_frame_times_ms
+		if not frame_times:
+			return
+		budget_ms = self.preview_timer.interval()
+		print(
+			f"Live preview: {len(frame_times)} frames, draw time {sum(frame_times) / len(frame_times):.2f} ms mean / "
+			f"{max(frame_times):.2f} ms max, budget {budget_ms} ms, over budget: {sum(t > budget_ms for t in frame_times)}"
+		)
 
-		# Draw path if the flag is set
-		if self.show_path_flag:
-			pen = QPen(QColor(*self.path_color), 2)
-			painter.setPen(pen)
-			for i in range(len(self.data.state.points) - 1):
-				if self.data.state.points[i+1][-1] > self.data.state.time:
-					break
-				x1, y1 = self.data.state.points[i][:2]
-				x1, y1 = self.data.reverse_process_x_and_y_for_record(x1, y1) 
-				x2, y2 = self.data.state.points[i+1][:2]
-				x2, y2 = self.data.reverse_process_x_and_y_for_record(x2, y2) 
-				painter.drawLine(
-					int(x1), int(y1),
-					int(x2), int(y2)
-					# int(self.data.state.points[i][0]),
-					# int(self.data.state.points[i][1]),
-					# int(self.data.state.points[i + 1][0]),
-					# int(self.data.state.points[i + 1][1]),
-				)
+	def paintEvent(self, event):
+		"""Handles custom painting of the test elements from the cached scene and path."""
+		paint_start = time.perf_counter_ns()
+		if self.scene_cache is None or self.scene_cache.deviceIndependentSize().toSize() != self.size():
+			self.scene_cache = self.build_scene_cache()
+			self.path_cache = None
 
+		painter = QPainter(self)
+		if self.show_path_flag:
+			if self.path_cache is None:
+				self.path_cache = self.build_path_cache()
+			painter.drawPixmap(0, 0, self.path_cache)
+		elif self.live_cache is not None:
+			painter.drawPixmap(0, 0, self.live_cache)
+		else:
+			painter.drawPixmap(0, 0, self.scene_cache)
+		painter.end()
+		if self.telemetry is not None:
+			self.telemetry.record('paint_ns', time.perf_counter_ns() - paint_start)
+
+		if self.switch_start_ns is not None:
+			switch_ms = (time.perf_counter_ns() - self.switch_start_ns) / 1e6
+			self.switch_start_ns = None
+			self.switch_times_ms.append(switch_ms)
+			print(f"Trial switch: {switch_ms:.1f} ms")
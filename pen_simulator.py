@@ -0,0 +1,261 @@
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")      # runs without a display, e.g. on CI machines
+
+import json
+import argparse
+import tempfile
+from bisect import bisect_right
+from pathlib import Path
+import numpy as np
+from PyQt6.QtCore import QObject, QTimer
+from PyQt6.QtWidgets import QApplication
+from models import Data, ScreenDimensions
+from replay import read_trial_csv
+from noise import white_noise, pink_noise_filter, normalize, generate_sequences, sequence_to_trial_set
+
+PATH_RATE = 1000                    # Hz, resolution of generated paths
+PATH_AMPLITUDE_CM = 2               # largest lateral deviation of generated paths
+PATH_DURATION = 0.8                 # of the time to finish of the trial
+PEN_PRESSURE = 0.5
+PEN_DOWN_DELAY = 100                # ms after the trial is shown
+DEFAULT_RATES = (100, 250, 500, 1000, 2000)
+DEFAULT_DIMENSIONS = (1920, 1080, 52.7, 29.6)       # px and cm
+SUSTAINED_RATE_RATIO = 0.99         # achieved over target rate for a rate to count as sustained
+
+
+class SimulatedPen:
+    def __init__(self, times_ms: np.ndarray, xs: np.ndarray, ys: np.ndarray, pressures: np.ndarray | None = None):
+        """
+        A pen moving along a trajectory, read by the test page instead of the tablet or the mouse.
+
+        The pen is read at the time of each sampler tick and its position is interpolated
+        linearly between the points of the trajectory, so any sample rate can be simulated
+        from the same path. Before the first and after the last point the pen holds still.
+
+        Args:
+            times_ms (np.ndarray): Time of each point since the start of the trial, increasing.
+            xs (np.ndarray): x of each point in window pixels.
+            ys (np.ndarray): y of each point in window pixels.
+            pressures (np.ndarray | None): Pressure of each point, `PEN_PRESSURE` if None.
+        """
+        self.times = np.asarray(times_ms, dtype=float).tolist()
+        self.xs = np.asarray(xs, dtype=float).tolist()
+        self.ys = np.asarray(ys, dtype=float).tolist()
+        self.pressures = [PEN_PRESSURE] * len(self.times) if pressures is None else np.asarray(pressures, dtype=float).tolist()
+
+    def read(self, elapsed_ms: float) -> tuple:
+        """Returns the pen at a time since the start of the trial, in the tablet data layout of `TestPage.tabletEvent`."""
+        i = bisect_right(self.times, elapsed_ms)
+        if i == 0:
+            x, y, pressure = self.xs[0], self.ys[0], self.pressures[0]
+        elif i == len(self.times):
+            x, y, pressure = self.xs[-1], self.ys[-1], self.pressures[-1]
+        else:
+            w = (elapsed_ms - self.times[i - 1]) / (self.times[i] - self.times[i - 1])
+            x = self.xs[i - 1] + w * (self.xs[i] - self.xs[i - 1])
+            y = self.ys[i - 1] + w * (self.ys[i] - self.ys[i - 1])
+            pressure = self.pressures[i - 1]
+        return x, y, pressure, 0.0, 0.0, 0.0, int(elapsed_ms)
+
+    @classmethod
+    def from_trial_csv(cls, path: Path, data: Data) -> 'SimulatedPen':
+        """Replays a recorded trial CSV file, converted to the window pixels of `data`."""
+        samples, _ = read_trial_csv(path)
+        xs, ys, pressures, *_, times = (np.array(column, dtype=float) for column in zip(*samples))
+        xs, ys = data.reverse_process_x_and_y_for_record(xs, ys)
+        times, unique = np.unique(times, return_index=True)
+        pressures = np.where(np.isnan(pressures[unique]), PEN_PRESSURE, pressures[unique])
+        return cls(times, xs[unique], ys[unique], pressures)
+
+    @classmethod
+    def noise_driven(cls, data: Data, rng: np.random.Generator, kind: str = 'pink', duration_ms: float | None = None,
+                     amplitude_cm: float = PATH_AMPLITUDE_CM) -> 'SimulatedPen':
+        """
+        Generates a path from the source to the destination circle of `data` with noisy lateral deviations.
+
+        The pen moves at a constant horizontal speed and deviates vertically by pink or white noise,
+        faded in and out so the path starts in the source and ends in the destination circle.
+        """
+        duration_ms = data.time_to_finish * PATH_DURATION if duration_ms is None else duration_ms
+        num_points = max(int(duration_ms * PATH_RATE / 1000), 2)
+        noise = white_noise(rng, 1, num_points)
+        if kind == 'pink':
+            noise = pink_noise_filter(noise)
+        progress = np.linspace(0, 1, num_points)
+        deviation = normalize(noise, amplitude_cm * data.dimensions.Y_CM_TO_PIXEL)[0] * np.sin(np.pi * progress)
+
+        source, dest = data.source_circle, data.dest_circle
+        xs = source.x + progress * (dest.x - source.x)
+        ys = source.y + progress * (dest.y - source.y) + deviation
+        return cls(progress * duration_ms, xs, ys)
+
+
+def find_trial_csvs(paths: list[str]) -> list[Path]:
+    """Returns the trial CSV files given directly or found under the given directories."""
+    files = []
+    for path in map(Path, paths):
+        candidates = sorted(path.rglob("*.csv")) if path.is_dir() else [path]
+        files += [file for file in candidates if file.stem.rpartition('_')[2].isdigit()]
+    return files
+
+
+class LoadTest(QObject):
+    def __init__(self, rates: list[float], num_trials: int, dimensions: ScreenDimensions, target_dir: str,
+                 replay_files: list[Path] | None = None, kind: str = 'pink', seed=None):
+        """
+        Runs blocks of trials on a real `TestPage` with a simulated pen, one block per sample rate.
+
+        The obstacles of each block come from a seeded noise sequence, and each trial is drawn by
+        a `SimulatedPen` that replays a recorded trial or follows a generated noisy path. The
+        sampling statistics, the number of samples and the end-of-trial detection latency of
+        every trial are collected.
+
+        Args:
+            rates (list[float]): Sample rates to run a block at, in Hz.
+            num_trials (int): Number of trials per block.
+            dimensions (ScreenDimensions): Screen geometry of the trials.
+            target_dir (str): Directory of the trial files written by the test page.
+            replay_files (list[Path] | None): Trial CSV files to replay in turn, or None to generate paths.
+            kind (str): 'pink' or 'white' noise of the generated paths.
+            seed: Seed of the obstacles and the generated paths.
+        """
+        super().__init__()
+        self.rates = list(rates)
+        self.num_trials = num_trials
+        self.dimensions = dimensions
+        self.target_dir = target_dir
+        self.replay_files = replay_files or []
+        self.kind = kind
+        self.rng = np.random.default_rng(seed)
+        self.xs, self.ys = generate_sequences('pink', 1, max(num_trials, 2), seed)
+
+        self.results = {}           # rate -> list of trial results
+        self.rate = None
+        self.manager = None
+        self.page = None
+        self.num_pens = 0
+
+    def start(self) -> None:
+        self.next_block()
+
+    def next_block(self) -> None:
+        from pages.test_page import PageManager
+
+        if not self.rates:
+            QApplication.instance().quit()
+            return
+        self.rate = self.rates.pop(0)
+        self.results[self.rate] = []
+        trial_set = sequence_to_trial_set(self.xs[0][:self.num_trials], self.ys[0][:self.num_trials], rate=int(self.rate))
+        self.manager = PageManager(trial_set, dimensions=self.dimensions)
+        self.manager.start_test_signal.connect(self.show_trial)
+        self.manager.trial_completed_signal.connect(self.collect_trial)
+        self.manager.finished_signal.connect(self.finish_block)
+        self.manager.start_tests()
+
+    def show_trial(self, data: Data) -> None:
+        """Shows the trial on the block's page and puts the simulated pen down on the source circle."""
+        from pages.test_page import TestPage
+
+        if self.page is None:
+            self.page = TestPage(data, self.target_dir, f"{int(self.rate)}hz", self.manager)
+            self.page.show()
+        else:
+            self.page.load_trial(data)
+        self.page.input_source = self.next_pen(data)
+        QTimer.singleShot(PEN_DOWN_DELAY, self.page.start_tracking)
+
+    def next_pen(self, data: Data) -> SimulatedPen:
+        if self.replay_files:
+            path = self.replay_files[self.num_pens % len(self.replay_files)]
+            self.num_pens += 1
+            return SimulatedPen.from_trial_csv(path, data)
+        return SimulatedPen.noise_driven(data, self.rng, self.kind)
+
+    def collect_trial(self, test_number: int) -> None:
+        page = self.page
+        end_latency_ms = page.end_latency_ns / 1e6 if page.end_latency_ns is not None else None
+        self.results[self.rate].append({
+            'test_number': test_number,
+            'sampler': page.sampler.report(),
+            'samples_recorded': len(page.state.points),
+            'end_latency_ms': end_latency_ms,
+            'success': int(page.state.success_status),
+        })
+        print(f"{self.rate:g} Hz, test {test_number}: {page.sampler}, end detected after {_format_ms(end_latency_ms)}")
+
+    def finish_block(self) -> None:
+        self.page.close_workers()
+        self.page.deleteLater()
+        self.page = None
+        QTimer.singleShot(0, self.next_block)
+
+
+def _format_ms(value: float | None) -> str:
+    return f"{value:.2f} ms" if value is not None else "n/a"
+
+
+def summarize(results: dict) -> dict:
+    """Returns the achieved rate, missed ticks and end detection latency of each rate, and the highest sustained rate."""
+    summary = {}
+    for rate, trials in results.items():
+        reports = [trial['sampler'] for trial in trials]
+        latencies = [trial['end_latency_ms'] for trial in trials if trial['end_latency_ms'] is not None]
+        achieved = min((report['achieved_rate_hz'] for report in reports), default=0.0)
+        missed = sum(report['missed_ticks'] for report in reports)
+        summary[rate] = {
+            'trials': len(trials),
+            'min_achieved_rate_hz': achieved,
+            'samples': sum(report['samples'] for report in reports),
+            'missed_ticks': missed,
+            'max_jitter_us': max((report['max_jitter_us'] for report in reports), default=0.0),
+            'mean_end_latency_ms': float(np.mean(latencies)) if latencies else None,
+            'max_end_latency_ms': max(latencies, default=None),
+            'sustained': bool(trials) and not missed and achieved >= SUSTAINED_RATE_RATIO * rate,
+        }
+    sustained = [rate for rate, rate_summary in summary.items() if rate_summary['sustained']]
+    return {'rates': summary, 'max_sustained_rate_hz': max(sustained, default=None)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the trial loop with a simulated pen, without a display or a tablet.")
+    parser.add_argument('--rates', nargs='+', type=float, default=DEFAULT_RATES, help="sample rates to test, in Hz")
+    parser.add_argument('--trials', type=int, default=5, help="trials per rate")
+    parser.add_argument('--replay', nargs='+', help="trial CSV files, or directories of them, to replay instead of generated paths")
+    parser.add_argument('--noise', choices=('pink', 'white'), default='pink', help="noise of the generated paths")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--calibration', help="screen calibration file, a 1920x1080 px, 52.7x29.6 cm screen by default")
+    parser.add_argument('--target-dir', help="directory for the trial files (default: a temporary directory)")
+    parser.add_argument('--output', help="write the results of every trial and the summary to this JSON file")
+    args = parser.parse_args()
+
+    from audio import disable_cues
+
+    app = QApplication([])
+    disable_cues()
+    dimensions = ScreenDimensions.load(args.calibration) if args.calibration else ScreenDimensions.from_size(*DEFAULT_DIMENSIONS)
+    replay_files = find_trial_csvs(args.replay) if args.replay else None
+    with tempfile.TemporaryDirectory() as temp_dir:
+        target_dir = args.target_dir or temp_dir
+        os.makedirs(target_dir, exist_ok=True)
+        load_test = LoadTest(args.rates, args.trials, dimensions, target_dir, replay_files, args.noise, args.seed)
+        QTimer.singleShot(0, load_test.start)
+        app.exec()
+
+    summary = summarize(load_test.results)
+    for rate, rate_summary in summary['rates'].items():
+        print(
+            f"{rate:g} Hz: achieved {rate_summary['min_achieved_rate_hz']:.1f} Hz (lowest trial), "
+            f"missed ticks: {rate_summary['missed_ticks']}, end latency: {_format_ms(rate_summary['mean_end_latency_ms'])} mean / "
+            f"{_format_ms(rate_summary['max_end_latency_ms'])} max"
+        )
+    max_rate = summary['max_sustained_rate_hz']
+    print(f"Highest sustained rate: {f'{max_rate:g} Hz' if max_rate is not None else 'none of the tested rates'}")
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({**summary, 'trials': load_test.results}, file, indent=4)
+        print(f"Results saved at: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import os
+import csv
+import time
+import shutil
+import threading
+from pathlib import Path
+from sampling import SampleQueue
+
+
+def trial_csv_header(num_circles: int, num_rects: int) -> list[str]:
+    """Returns the header of a trial CSV file."""
+    header = ['x', 'y', 'pressure', 'x_tilt', 'y_tilt', 'rotation', 'tablet_time', 'time', 'total_time', 'success', 'timeout', 'dest_passed', 'source_hit', 'dest_hit']
+    header += [f"circle_{i + 1}_hit" for i in range(num_circles)]
+    header += [f"rect_{i + 1}_hit" for i in range(num_rects)]
+    header += [f'distance of last point from center of dest']
+    return header
+
+
+class TrialRecorder:
+    def __init__(self, output_path: Path):
+        """
+        Streams the samples of a trial to disk while it runs.
+
+        Samples are appended to a journal file (`<name>.partial.csv`) by a background writer
+        thread, one flushed batch at a time, so a crash loses at most the last batch. When the
+        trial ends, `finish` hands over the header and summary fields and the writer produces
+        the usual trial CSV: header, first sample with the summary, then the journal's remaining
+        rows copied over as they are.
+
+        Args:
+            output_path (Path): Path of the final trial CSV file.
+        """
+        self.output_path = Path(output_path)
+        self.journal_path = self.output_path.with_suffix('.partial.csv')
+        self.num_samples = 0
+        self.first_sample = None
+        self.header = None
+        self.summary = None
+        self.finalize_ns = None         # time spent writing the final file, set once it is written
+
+        self._queue = SampleQueue()
+        self._thread = threading.Thread(target=self._write)
+
+    def start(self) -> None:
+        """Creates the journal file and starts the writer thread."""
+        self._journal = self.journal_path.open(mode="w", newline="")
+        self._thread.start()
+
+    def append(self, sample) -> None:
+        """Queues a sample row for writing."""
+        self._queue.put(sample)
+
+    def finish(self, header: list, summary: list) -> None:
+        """Queues the end of the trial. The final file is written in the background."""
+        self.header = header
+        self.summary = summary
+        self._queue.close()
+
+    def wait(self) -> None:
+        """Waits until the final file has been written."""
+        self._thread.join()
+
+    def _write(self) -> None:
+        writer = csv.writer(self._journal)
+        with self._journal:
+            while batch := self._queue.get_batch():
+                if self.first_sample is None:
+                    self.first_sample = batch[0]
+                writer.writerows(batch)
+                self._journal.flush()
+                self.num_samples += len(batch)
+        if self.first_sample is not None:
+            start = time.perf_counter_ns()
+            self._finalize()
+            self.finalize_ns = time.perf_counter_ns() - start
+
+    def _finalize(self) -> None:
+        tmp_path = self.output_path.with_suffix('.csv.tmp')
+        with tmp_path.open(mode="w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(self.header)
+            writer.writerow([*self.first_sample, *self.summary])
+            with self.journal_path.open(newline="") as journal:
+                journal.readline()
+                shutil.copyfileobj(journal, file)
+        os.replace(tmp_path, self.output_path)
+        os.remove(self.journal_path)
+        print(f"Trial data saved at: {self.output_path}")
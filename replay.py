@@ -0,0 +1,185 @@
+import os
+import csv
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from config import OUTPUT_DIR, DATA_DIRECTORY, MAX_NUM_OF_ADDITIONAL_RCORDED_POINTS
+from models import Data, ScreenDimensions
+from trial_set import load_trial_set
+from session import resolve_blocks
+
+SUMMARY_FIELDS = ('total_time', 'success', 'timeout', 'dest_passed', 'source_hit', 'dest_hit')
+NUM_SAMPLE_FIELDS = 8
+
+
+def read_trial_csv(path: Path) -> tuple[list[tuple], dict]:
+    """
+    Reads a trial CSV file written by the test page.
+
+    Returns:
+        tuple[list[tuple], dict]: The samples, with missing fields as None, and the recorded
+        summary fields of the first row, with the circle and rectangle hits as lists.
+
+    Raises:
+        ValueError: If the file has no samples, e.g. an aborted trial.
+    """
+    with Path(path).open(newline="") as file:
+        reader = csv.reader(file)
+        header = next(reader, None)
+        rows = [row for row in reader if row]
+    if header is None or not rows:
+        raise ValueError(f"No samples in trial file: {path}")
+
+    samples = [_parse_sample(row[:NUM_SAMPLE_FIELDS]) for row in rows]
+    first = dict(zip(header, rows[0]))
+    summary = {name: float(first[name]) if name == 'total_time' else int(first[name]) for name in SUMMARY_FIELDS}
+    summary['circles_hit'] = [int(first[name]) for name in header if name.startswith('circle_')]
+    summary['rects_hit'] = [int(first[name]) for name in header if name.startswith('rect_')]
+    summary['dest_distance'] = float(rows[0][-1])
+    return samples, summary
+
+
+def _parse_sample(row: list[str]) -> tuple:
+    x, y, pressure, x_tilt, y_tilt, rotation, tablet_time, time = row
+    return (
+        float(x), float(y),
+        float(pressure) if pressure else None,
+        float(x_tilt) if x_tilt else None,
+        float(y_tilt) if y_tilt else None,
+        float(rotation) if rotation else None,
+        int(tablet_time) if tablet_time else None,
+        float(time)
+    )
+
+
+def replay_trial(data: Data, samples: list[tuple]) -> dict | None:
+    """
+    Feeds recorded samples through the trial logic of the test page and returns the recomputed summary.
+
+    The samples are in recorded coordinates (mm from the origin) and are converted back to
+    pixels with the geometry of `data`. As in the live test, the trial ends at the first sample
+    that meets an end condition, followed by up to `MAX_NUM_OF_ADDITIONAL_RCORDED_POINTS`
+    samples; the status is determined right after the end sample.
+
+    Returns:
+        dict | None: The summary fields, or None if no sample ended the trial.
+    """
+    state = data.state
+    additional_points = None
+    for x, y, *tablet_fields, t in samples:
+        x, y = data.reverse_process_x_and_y_for_record(x, y)
+        if additional_points is None:
+            if data.check_end(x, y, t):
+                state.time = t
+                additional_points = MAX_NUM_OF_ADDITIONAL_RCORDED_POINTS
+            data.process_input_data((x, y, *tablet_fields), t)
+            if additional_points is not None:
+                state.success_status = data.determine_status()
+        elif additional_points > 0:
+            data.process_input_data((x, y, *tablet_fields), t)
+            additional_points -= 1
+        else:
+            break
+
+    if state.time is None:
+        return None
+    last_x, last_y = state.points[-1][:2]
+    return {
+        'total_time': state.time,
+        'success': int(state.success_status),
+        'timeout': int(state.time > data.time_to_finish),
+        'dest_passed': state.dest_passed,
+        'source_hit': state.source_hit,
+        'dest_hit': state.dest_hit,
+        'circles_hit': list(state.circles_hit),
+        'rects_hit': list(state.rects_hit),
+        'dest_distance': data.dest_circle.calc_dist_to_center(data, last_x, last_y),
+    }
+
+
+def find_trial_files(results_dir: Path) -> dict[tuple[str, str], list[Path]]:
+    """
+    Finds the trial CSV files under a results directory laid out as `<participant>/<test type>/<block>_<test number>.csv`.
+
+    Returns:
+        dict[tuple[str, str], list[Path]]: The trial files grouped by test type and block.
+    """
+    blocks = {}
+    for path in sorted(Path(results_dir).glob("*/*/*.csv")):
+        prefix, _, test_number = path.stem.rpartition('_')
+        if not prefix or not test_number.isdigit():
+            continue
+        blocks.setdefault((path.parent.name, prefix), []).append(path)
+    return blocks
+
+
+def replay_block(data_dir: str, test_type: str, block: str, paths: list[Path], dimensions: ScreenDimensions) -> list[dict]:
+    """Replays the trial files of one block against its trial definitions."""
+    directory = dict(resolve_blocks(os.path.join(data_dir, test_type)))[block]
+    trial_set = load_trial_set(directory)
+    results = []
+    for path in paths:
+        test_number = int(path.stem.rpartition('_')[2])
+        try:
+            samples, recorded = read_trial_csv(path)
+        except ValueError as e:
+            print(f"Skipping {path}: {e}")
+            continue
+        data = Data(*trial_set.trial(test_number - 1), 75, dimensions=dimensions)
+        replayed = replay_trial(data, samples)
+        results.append({'path': str(path), 'test_number': test_number, 'recorded': recorded, 'replayed': replayed})
+    return results
+
+
+def write_summary(results: list[dict], output_path: Path) -> int:
+    """Writes the recorded and replayed summary of every trial and returns the number of trials whose outcome changed."""
+    changed = 0
+    with Path(output_path).open(mode="w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(['path', 'test_number', 'changed',
+                         *[f"recorded_{name}" for name in SUMMARY_FIELDS],
+                         *[f"replayed_{name}" for name in SUMMARY_FIELDS],
+                         'recorded_circles_hit', 'replayed_circles_hit', 'recorded_rects_hit', 'replayed_rects_hit'])
+        for result in results:
+            recorded, replayed = result['recorded'], result['replayed'] or {}
+            is_changed = any(recorded[name] != replayed.get(name) for name in ('success', 'timeout', 'dest_passed', 'source_hit', 'dest_hit', 'circles_hit', 'rects_hit'))
+            changed += is_changed
+            writer.writerow([
+                result['path'], result['test_number'], int(is_changed),
+                *[recorded[name] for name in SUMMARY_FIELDS],
+                *[replayed.get(name, '') for name in SUMMARY_FIELDS],
+                ' '.join(map(str, recorded['circles_hit'])), ' '.join(map(str, replayed.get('circles_hit', []))),
+                ' '.join(map(str, recorded['rects_hit'])), ' '.join(map(str, replayed.get('rects_hit', []))),
+            ])
+    return changed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Recompute the hits and outcome of recorded trials without running the test.")
+    parser.add_argument('results_dir', nargs='?', default=OUTPUT_DIR, help="directory with the participants' results")
+    parser.add_argument('--data-dir', default=DATA_DIRECTORY, help="directory with the trial definitions")
+    parser.add_argument('--calibration', help="screen calibration file of the recordings")
+    parser.add_argument('--screen-px', nargs=2, type=int, metavar=('WIDTH', 'HEIGHT'), help="screen size of the recordings in pixels")
+    parser.add_argument('--screen-cm', nargs=2, type=float, metavar=('WIDTH', 'HEIGHT'), help="physical screen size of the recordings in cm")
+    parser.add_argument('--workers', type=int, default=None, help="number of worker processes (default: number of CPUs)")
+    parser.add_argument('--output', default='replay_summary.csv', help="path of the summary CSV file")
+    args = parser.parse_args()
+    if args.calibration:
+        dimensions = ScreenDimensions.load(args.calibration)
+    elif args.screen_px and args.screen_cm:
+        dimensions = ScreenDimensions.from_size(*args.screen_px, *args.screen_cm)
+    else:
+        parser.error("either --calibration or both --screen-px and --screen-cm are required")
+    blocks = find_trial_files(args.results_dir)
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(replay_block, args.data_dir, test_type, block, paths, dimensions) for (test_type, block), paths in blocks.items()]
+        for future in futures:
+            results.extend(future.result())
+
+    changed = write_summary(results, args.output)
+    print(f"Replayed {len(results)} trials in {len(blocks)} blocks, {changed} with a changed outcome. Summary saved at: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import os
+import csv
+import argparse
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from sample_buffer import SAMPLE_DTYPE, to_rows
+from recorder import trial_csv_header
+
+BINARY_RESULTS_SUFFIX = '.results.npz'
+SUMMARY_DTYPE = np.dtype([
+    ('test_number', np.int32),
+    ('total_time', np.float64),
+    ('success', np.int8),
+    ('timeout', np.int8),
+    ('dest_passed', np.int8),
+    ('source_hit', np.int8),
+    ('dest_hit', np.int8),
+    ('dest_distance', np.float64),
+])
+
+
+class BlockResultWriter:
+    def __init__(self, path: Path, start_test_number: int = 1):
+        """
+        Collects the trials of a block and writes them to one binary columnar file.
+
+        Samples and per-trial summaries are stored separately: all samples of the block in one
+        structured array with per-trial offsets, the fixed summary fields in another, and the
+        circle and rectangle hit flags as flat arrays with their own offsets.
+
+        The file can be rewritten after every trial with `save_in_background`, so a crash loses
+        at most the current trial. A block resumed after a crash keeps the trials before
+        `start_test_number` from its existing file.
+
+        Args:
+            path (Path): Path of the `.results.npz` file to write.
+            start_test_number (int): First test number of this run of the block.
+        """
+        self.path = Path(path)
+        self._trials = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+        if start_test_number > 1:
+            if self.path.exists():
+                self._load_trials_before(start_test_number)
+            else:
+                print(f"Warning: {self.path} does not exist, it will only hold the trials from test {start_test_number}")
+
+    def _load_trials_before(self, start_test_number: int) -> None:
+        block = BlockResults(self.path)
+        for index, summary in enumerate(block.trials.tolist()):
+            if summary[0] < start_test_number:
+                circles_hit, rects_hit = block.trial_hits(index)
+                self._trials.append((summary, block.trial_samples(index), circles_hit.tolist(), rects_hit.tolist()))
+        print(f"Resuming {self.path} with its {len(self._trials)} trials before test {start_test_number}")
+
+    def add_trial(self, test_number: int, samples: np.ndarray, total_time: float, success: int, timeout: int,
+                  dest_passed: int, source_hit: int, dest_hit: int, circles_hit: list, rects_hit: list, dest_distance: float) -> None:
+        """Adds a finished trial. `samples` is copied."""
+        summary = (test_number, total_time, success, timeout, dest_passed, source_hit, dest_hit, dest_distance)
+        with self._lock:
+            self._trials.append((summary, samples.copy(), list(circles_hit), list(rects_hit)))
+
+    def save(self) -> None:
+        """Writes all trials added so far."""
+        with self._lock:
+            trials = list(self._trials)
+        if not trials:
+            return
+
+        summaries, samples, circles_hit, rects_hit = zip(*trials)
+        tmp_path = self.path.with_suffix('.tmp')
+        with tmp_path.open(mode='wb') as file:
+            np.savez(
+                file,
+                trials=np.array(list(summaries), dtype=SUMMARY_DTYPE),
+                samples=np.concatenate(samples).astype(SAMPLE_DTYPE, copy=False),
+                sample_offsets=_offsets(samples),
+                circles_hit=np.array([hit for hits in circles_hit for hit in hits], dtype=np.int8),
+                circle_offsets=_offsets(circles_hit),
+                rects_hit=np.array([hit for hits in rects_hit for hit in hits], dtype=np.int8),
+                rect_offsets=_offsets(rects_hit),
+            )
+        os.replace(tmp_path, self.path)
+        print(f"Binary results saved at: {self.path}")
+
+    def save_in_background(self) -> None:
+        """Queues a `save` on the writer's thread, after any save queued before."""
+        self._executor.submit(self.save)
+
+    def close(self) -> None:
+        """Waits for the queued saves to finish."""
+        self._executor.shutdown(wait=True)
+
+
+def _offsets(parts) -> np.ndarray:
+    return np.concatenate([[0], np.cumsum([len(part) for part in parts])]).astype(np.int64)
+
+
+class BlockResults:
+    def __init__(self, path: Path):
+        """
+        The trials of a block read back from a `.results.npz` file.
+
+        Attributes:
+            trials (np.ndarray): Summary record of each trial (`SUMMARY_DTYPE`).
+            samples (np.ndarray): Samples of all trials (`SAMPLE_DTYPE`), split by `sample_offsets`.
+        """
+        self.path = Path(path)
+        with np.load(self.path) as arrays:
+            self.trials = arrays['trials']
+            self.samples = arrays['samples']
+            self.sample_offsets = arrays['sample_offsets']
+            self.circles_hit = arrays['circles_hit']
+            self.circle_offsets = arrays['circle_offsets']
+            self.rects_hit = arrays['rects_hit']
+            self.rect_offsets = arrays['rect_offsets']
+
+    def __len__(self) -> int:
+        return len(self.trials)
+
+    @property
+    def prefix(self) -> str:
+        """File name prefix of the block's trial CSV files."""
+        return self.path.name[:-len(BINARY_RESULTS_SUFFIX)]
+
+    def trial_samples(self, index: int) -> np.ndarray:
+        """Returns the samples of a trial as a structured array view."""
+        return self.samples[self.sample_offsets[index]:self.sample_offsets[index + 1]]
+
+    def trial_hits(self, index: int) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the circle and rectangle hit flags of a trial."""
+        return (
+            self.circles_hit[self.circle_offsets[index]:self.circle_offsets[index + 1]],
+            self.rects_hit[self.rect_offsets[index]:self.rect_offsets[index + 1]]
+        )
+
+    def export_csv(self, output_dir: Path) -> list[Path]:
+        """Writes every trial in the per-trial CSV layout of the test page and returns the paths."""
+        paths = []
+        for index, summary in enumerate(self.trials.tolist()):
+            test_number, total_time, success, timeout, dest_passed, source_hit, dest_hit, dest_distance = summary
+            circles_hit, rects_hit = self.trial_hits(index)
+            rows = to_rows(self.trial_samples(index))
+            path = Path(output_dir) / f"{self.prefix}_{test_number}.csv"
+            with path.open(mode="w", newline="") as file:
+                writer = csv.writer(file)
+                writer.writerow(trial_csv_header(len(circles_hit), len(rects_hit)))
+                writer.writerow([
+                    *rows[0], total_time, success, timeout, dest_passed, source_hit, dest_hit,
+                    *circles_hit.tolist(), *rects_hit.tolist(), dest_distance
+                ])
+                writer.writerows(rows[1:])
+            paths.append(path)
+        return paths
+
+
+def load_results(root: Path) -> list[BlockResults]:
+    """Loads every binary block result file under a directory, e.g. a participant or a whole study."""
+    return [BlockResults(path) for path in sorted(Path(root).rglob(f"*{BINARY_RESULTS_SUFFIX}"))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Convert binary block results to per-trial CSV files.")
+    parser.add_argument('results', nargs='+', help="`.results.npz` files or directories to search for them")
+    parser.add_argument('--output-dir', help="directory for the CSV files (default: next to each results file)")
+    args = parser.parse_args()
+
+    for target in map(Path, args.results):
+        blocks = load_results(target) if target.is_dir() else [BlockResults(target)]
+        for block in blocks:
+            output_dir = Path(args.output_dir) if args.output_dir else block.path.parent
+            output_dir.mkdir(parents=True, exist_ok=True)
+            paths = block.export_csv(output_dir)
+            print(f"{block.path}: {len(paths)} trials exported to {output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import numpy as np
+
+SAMPLE_FIELDS = ('x', 'y', 'pressure', 'x_tilt', 'y_tilt', 'rotation', 'tablet_time', 'time')
+SAMPLE_DTYPE = np.dtype([
+    ('x', np.float64),
+    ('y', np.float64),
+    ('pressure', np.float64),
+    ('x_tilt', np.float64),
+    ('y_tilt', np.float64),
+    ('rotation', np.float64),
+    ('tablet_time', np.int64),
+    ('time', np.float64),
+])
+MISSING_TABLET_TIME = -1
+
+
+class SampleBuffer:
+    def __init__(self, capacity: int = 1024):
+        """
+        A preallocated, growable buffer of recorded samples with typed columns.
+
+        Missing tablet fields (mouse input) are stored as NaN, and a missing tablet time as
+        `MISSING_TABLET_TIME`; `row` turns both back into None. A single thread appends while
+        others may read: a row is fully written before the length is increased, and growing
+        the buffer swaps in a new array without touching the old one.
+
+        Args:
+            capacity (int): Number of samples to preallocate.
+        """
+        self._array = np.empty(max(capacity, 1), dtype=SAMPLE_DTYPE)
+        self._length = 0
+
+    def append(self, x, y, pressure, x_tilt, y_tilt, rotation, tablet_time, time) -> None:
+        """Appends a sample, growing the buffer if it is full."""
+        n = self._length
+        if n == len(self._array):
+            grown = np.empty(2 * n, dtype=SAMPLE_DTYPE)
+            grown[:n] = self._array
+            self._array = grown
+        self._array[n] = (
+            x, y,
+            float('nan') if pressure is None else pressure,
+            float('nan') if x_tilt is None else x_tilt,
+            float('nan') if y_tilt is None else y_tilt,
+            float('nan') if rotation is None else rotation,
+            MISSING_TABLET_TIME if tablet_time is None else tablet_time,
+            time
+        )
+        self._length = n + 1
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index: int) -> tuple:
+        return self.row(index)
+
+    def row(self, index: int) -> tuple:
+        """Returns a sample as a tuple in `SAMPLE_FIELDS` order, with missing fields as None."""
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("sample index out of range")
+        return _to_row(self._array[index].tolist())
+
+    def column(self, name: str) -> np.ndarray:
+        """Returns a view of a column over the recorded samples."""
+        return self._array[name][:self._length]
+
+    def view(self) -> np.ndarray:
+        """Returns a view of the recorded samples as a structured array."""
+        return self._array[:self._length]
+
+
+def _to_row(sample: tuple) -> tuple:
+    x, y, pressure, x_tilt, y_tilt, rotation, tablet_time, time = sample
+    return (
+        x, y,
+        None if pressure != pressure else pressure,
+        None if x_tilt != x_tilt else x_tilt,
+        None if y_tilt != y_tilt else y_tilt,
+        None if rotation != rotation else rotation,
+        None if tablet_time == MISSING_TABLET_TIME else tablet_time,
+        time
+    )
+
+
+def to_rows(samples: np.ndarray) -> list[tuple]:
+    """Converts a structured array of samples to row tuples, with missing fields as None."""
+    return [_to_row(sample) for sample in samples.tolist()]
@@ -0,0 +1,144 @@
+import time
+import threading
+from collections import deque
+from config import SAMPLER_SPIN_US
+
+
+class Sampler:
+    def __init__(self, rate: float, sample, spin_us: float = SAMPLER_SPIN_US):
+        """
+        Calls `sample` on a fixed-rate deadline schedule.
+
+        The thread sleeps until just before each deadline and only busy-waits for the
+        last `spin_us` microseconds, so it holds the configured rate at a small CPU cost.
+        Deadlines are fixed multiples of the period after the start time, so lateness on
+        one tick does not push the following ones back.
+
+        Args:
+            rate (float): Sampling rate in Hz.
+            sample: Callable receiving the `time.perf_counter_ns()` value of the tick.
+            spin_us (float): Busy-wait window before each deadline, in microseconds.
+        """
+        self.period_ns = int(1e9 / rate)
+        self.sample = sample
+        self.spin_ns = int(spin_us * 1000)
+        self.reset()
+
+    def reset(self) -> None:
+        """Clears the statistics of the previous run."""
+        self.num_samples = 0
+        self.missed_ticks = 0
+        self.first_tick_ns = None
+        self.last_tick_ns = None
+        self.jitter_sum_ns = 0
+        self.jitter_max_ns = 0
+        self.cpu_ns = 0
+
+    def run(self, start_time_ns: int, is_running) -> None:
+        """Samples until `is_running()` returns False."""
+        self.reset()
+        period = self.period_ns
+        deadline = start_time_ns + period
+        cpu_start = time.thread_time_ns()
+
+        while is_running():
+            remaining = deadline - time.perf_counter_ns()
+            if remaining > self.spin_ns:
+                time.sleep((remaining - self.spin_ns) / 1e9)
+            while (now := time.perf_counter_ns()) < deadline:
+                pass
+            if not is_running():
+                break
+
+            self._record_tick(now, now - deadline)
+            self.sample(now)
+
+            deadline += period
+            if now >= deadline:
+                # Overran at least one full period, skip the ticks that are already gone
+                skipped = (now - deadline) // period + 1
+                self.missed_ticks += skipped
+                deadline += skipped * period
+
+        self.cpu_ns = time.thread_time_ns() - cpu_start
+
+    def _record_tick(self, now: int, jitter: int) -> None:
+        if self.first_tick_ns is None:
+            self.first_tick_ns = now
+        self.last_tick_ns = now
+        self.num_samples += 1
+        self.jitter_sum_ns += jitter
+        self.jitter_max_ns = max(self.jitter_max_ns, jitter)
+
+    def report(self) -> dict:
+        """Returns the achieved rate, jitter and CPU cost of the last run."""
+        duration_ns = (self.last_tick_ns - self.first_tick_ns) if self.num_samples > 1 else 0
+        return {
+            'target_rate_hz': 1e9 / self.period_ns,
+            'achieved_rate_hz': (self.num_samples - 1) * 1e9 / duration_ns if duration_ns else 0.0,
+            'samples': self.num_samples,
+            'missed_ticks': self.missed_ticks,
+            'mean_jitter_us': self.jitter_sum_ns / self.num_samples / 1e3 if self.num_samples else 0.0,
+            'max_jitter_us': self.jitter_max_ns / 1e3,
+            'cpu_percent': 100 * self.cpu_ns / duration_ns if duration_ns else 0.0,
+        }
+
+    def __str__(self) -> str:
+        report = self.report()
+        return (
+            f"rate: {report['achieved_rate_hz']:.1f}/{report['target_rate_hz']:.1f} Hz, "
+            f"samples: {report['samples']}, missed ticks: {report['missed_ticks']}, "
+            f"jitter: {report['mean_jitter_us']:.0f} us mean / {report['max_jitter_us']:.0f} us max, "
+            f"cpu: {report['cpu_percent']:.1f}%"
+        )
+
+
+class SampleQueue:
+    def __init__(self, maxsize: int = 10000):
+        """
+        A bounded producer/consumer queue that hands out everything queued at once.
+
+        The consumer blocks on a condition variable instead of polling, and the producer
+        closes the queue once it stops so the consumer knows no more samples will come.
+
+        Args:
+            maxsize (int): Number of items after which `put` blocks until the consumer drains.
+        """
+        self.maxsize = maxsize
+        self.items = deque()
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def put(self, item) -> None:
+        """Appends an item, waiting while the queue is full."""
+        with self.condition:
+            self.condition.wait_for(lambda: len(self.items) < self.maxsize or self.closed)
+            self.items.append(item)
+            self.condition.notify_all()
+
+    def get_batch(self, timeout: float | None = None) -> deque:
+        """
+        Waits for items and returns all of them in arrival order.
+
+        Returns an empty batch once the queue is closed and drained, or when `timeout` expires.
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.items or self.closed, timeout)
+            batch, self.items = self.items, deque()
+            self.condition.notify_all()
+            return batch
+
+    def close(self) -> None:
+        """Marks the end of the stream and wakes up any waiting consumer."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def reset(self) -> None:
+        """Empties and reopens the queue for a new stream."""
+        with self.condition:
+            self.items.clear()
+            self.closed = False
+
+    def __len__(self) -> int:
+        return len(self.items)
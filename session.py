@@ -0,0 +1,148 @@
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from config import INPUT_DATA_FILE_NAME, INPUT_CIRCLES_FILE_NAME, INPUT_RECTS_FILE_NAME, SESSION_PROGRESS_FILE_NAME
+
+
+def resolve_blocks(input_dir: str) -> list[tuple[str, str]]:
+    """
+    Returns the name and directory of each block of a test type, in order.
+
+    The blocks are the numbered subfolders of the test type's directory. A test type without
+    subfolders, whose Excel files sit directly in its directory, is a single block named after it.
+    """
+    folders = [folder for folder in os.listdir(input_dir) if folder.isdigit() and os.path.isdir(os.path.join(input_dir, folder))]
+    if folders:
+        return [(folder, os.path.join(input_dir, folder)) for folder in sorted(folders, key=int)]
+    if all(os.path.exists(os.path.join(input_dir, name)) for name in (INPUT_DATA_FILE_NAME, INPUT_CIRCLES_FILE_NAME, INPUT_RECTS_FILE_NAME)):
+        return [(os.path.basename(os.path.normpath(input_dir)), input_dir)]
+    return []
+
+
+def _load_trial_set(directory: str):
+    from trial_set import load_trial_set      # pulls in numpy, imported on the worker thread
+
+    return load_trial_set(directory)
+
+
+# Blocks being loaded by any scheduler, by directory, so a block is never compiled twice at once
+_loading: dict[str, Future] = {}
+_loading_lock = threading.RLock()
+
+
+def _submit_load(executor: ThreadPoolExecutor, directory: str) -> Future:
+    """
+    Submits the loading of a block, or returns the loading of the same block that is still in
+    progress, e.g. on a scheduler cancelled while it was compiling that block.
+    """
+    key = os.path.abspath(directory)
+    with _loading_lock:
+        future = _loading.get(key)
+        if future is None or future.cancelled():
+            future = executor.submit(_load_trial_set, directory)
+            _loading[key] = future
+            future.add_done_callback(lambda done: _forget_load(key, done))
+        return future
+
+
+def _forget_load(key: str, future: Future) -> None:
+    with _loading_lock:
+        if _loading.get(key) is future:
+            del _loading[key]
+
+
+class SessionScheduler:
+    def __init__(self, input_dir: str):
+        """
+        The blocks of a test type, compiled and loaded in the background.
+
+        All trial sets are loaded one after another on a worker thread as soon as the scheduler is
+        created, e.g. while the form is being filled in, and kept in memory for the whole session.
+        A block that another scheduler is still loading is waited for instead of loaded again.
+        The progress of a participant is saved after every trial so an interrupted session can be
+        resumed at the next trial.
+
+        Args:
+            input_dir (str): Directory of the test type, e.g. `data/C1`.
+        """
+        self.input_dir = input_dir
+        self.blocks = resolve_blocks(input_dir)
+
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._trial_sets = [_submit_load(self._executor, directory) for _, directory in self.blocks]
+        self._executor.shutdown(wait=False)
+
+    def __len__(self) -> int:
+        return len(self.blocks)
+
+    def block_name(self, index: int) -> str:
+        """Returns the name of a block, used as the file name prefix of its results."""
+        return self.blocks[index][0]
+
+    def trial_set(self, index: int):
+        """Returns the trial set of a block, waiting for it if it is still being loaded, or loading it if it was cancelled."""
+        if self._trial_sets[index].cancelled():
+            return _load_trial_set(self.blocks[index][1])
+        return self._trial_sets[index].result()
+
+    def cancel(self) -> None:
+        """
+        Cancels the loading of the blocks that have not started loading yet, e.g. when another test
+        type is selected. A block that is already loading finishes, and is reused by the next
+        scheduler of its test type.
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def save_progress(self, target_dir: str, block_index: int, test_number: int) -> None:
+        """Saves the last completed trial of the session in the participant's directory."""
+        progress = {
+            'block': self.block_name(block_index),
+            'block_index': block_index,
+            'last_completed_test': test_number,
+            'num_tests': len(self.trial_set(block_index)),
+        }
+        path = os.path.join(target_dir, SESSION_PROGRESS_FILE_NAME)
+        with open(f"{path}.tmp", 'w') as file:
+            json.dump(progress, file, indent=4)
+        os.replace(f"{path}.tmp", path)
+
+    def _load_progress(self, target_dir: str) -> dict | None:
+        """Returns the saved progress in the participant's directory if it refers to a block of this session."""
+        path = os.path.join(target_dir, SESSION_PROGRESS_FILE_NAME)
+        if not os.path.exists(path):
+            return None
+        with open(path) as file:
+            progress = json.load(file)
+        if progress['block'] not in [name for name, _ in self.blocks]:
+            return None
+        return progress
+
+    def is_completed(self, target_dir: str) -> bool:
+        """Returns True if the saved progress in the participant's directory is the last trial of the last block."""
+        progress = self._load_progress(target_dir)
+        return (
+            progress is not None and progress['block'] == self.block_name(len(self.blocks) - 1)
+            and progress['last_completed_test'] >= progress['num_tests']
+        )
+
+    def resume_point(self, target_dir: str) -> tuple[int, int]:
+        """
+        Returns the block index and the test number to start the session from.
+
+        The session starts at the trial after the last completed one saved in the participant's
+        directory, or at the beginning if there is no saved progress or the session was completed
+        (see `is_completed`).
+        """
+        progress = self._load_progress(target_dir)
+        if progress is None:
+            return 0, 1
+
+        names = [name for name, _ in self.blocks]
+        block_index = names.index(progress['block'])
+        test_number = progress['last_completed_test'] + 1
+        if test_number > progress['num_tests']:
+            block_index, test_number = block_index + 1, 1
+        if block_index >= len(self.blocks):
+            return 0, 1
+        return block_index, test_number
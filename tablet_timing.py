@@ -0,0 +1,117 @@
+import numpy as np
+from sample_buffer import SAMPLE_DTYPE
+from config import TABLET_TIMESTAMP_RESOLUTION_MS
+
+RAW_EVENT_FIELDS = ('x', 'y', 'pressure', 'x_tilt', 'y_tilt', 'rotation', 'event_ms', 'arrival_ns')
+RAW_EVENT_DTYPE = np.dtype([
+    ('x', np.float64),
+    ('y', np.float64),
+    ('pressure', np.float64),
+    ('x_tilt', np.float64),
+    ('y_tilt', np.float64),
+    ('rotation', np.float64),
+    ('event_ms', np.int64),             # QTabletEvent.timestamp(), ms on the clock of the input events
+    ('arrival_ns', np.int64),           # time.perf_counter_ns() when the event reached the page
+])
+INTERPOLATED_FIELDS = ('x', 'y', 'pressure', 'x_tilt', 'y_tilt', 'rotation')
+
+
+class RawEventBuffer:
+    def __init__(self, capacity: int = 4096):
+        """
+        A preallocated, growable buffer of every tablet event with its hardware and arrival timestamps.
+
+        The GUI thread is the only writer and other threads read without taking a lock: a row
+        is fully written before the length is increased, and growing swaps in a new array that
+        already holds every published row, so `view` always returns complete events.
+
+        Args:
+            capacity (int): Number of events to preallocate.
+        """
+        self._array = np.empty(max(capacity, 1), dtype=RAW_EVENT_DTYPE)
+        self._length = 0
+
+    def append(self, x, y, pressure, x_tilt, y_tilt, rotation, event_ms, arrival_ns) -> None:
+        """Appends an event, growing the buffer if it is full."""
+        n = self._length
+        if n == len(self._array):
+            grown = np.empty(2 * n, dtype=RAW_EVENT_DTYPE)
+            grown[:n] = self._array
+            self._array = grown
+        self._array[n] = (x, y, pressure, x_tilt, y_tilt, rotation, event_ms, arrival_ns)
+        self._length = n + 1
+
+    def reset(self) -> None:
+        """Forgets the events of the previous trial. Only the writer may call this."""
+        self._length = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def view(self) -> np.ndarray:
+        """Returns a view of the events written so far as a structured array."""
+        # The length is read before the array, which holds at least that many rows
+        n = self._length
+        return self._array[:n]
+
+
+def align_event_times(event_ms: np.ndarray, arrival_ns: np.ndarray, resolution_ms: float = TABLET_TIMESTAMP_RESOLUTION_MS) -> np.ndarray:
+    """
+    Maps the hardware timestamps of input events onto the `time.perf_counter_ns()` clock.
+
+    The offset between the two clocks is the smallest difference between the arrival time of an
+    event and its timestamp, i.e. the event that was delivered fastest. Each event then happened
+    within one timestamp resolution after its timestamp moved by that offset: its arrival time is
+    used when it falls inside that window, so promptly delivered events keep sub-millisecond
+    precision, and later arrivals, delayed by the event loop, are pulled back to the end of the window.
+
+    Events without usable timestamps, e.g. synthesized ones whose timestamps never advance,
+    keep their arrival times.
+
+    Returns:
+        np.ndarray: Non-decreasing event times in perf counter ns.
+    """
+    if not len(event_ms):
+        return np.empty(0, dtype=np.int64)
+    if event_ms[-1] <= event_ms[0] and len(event_ms) > 1:
+        return np.maximum.accumulate(arrival_ns)
+    window_start = event_ms.astype(np.int64) * 1_000_000
+    offset = (arrival_ns - window_start).min()
+    window_start += offset
+    aligned = np.minimum(arrival_ns, window_start + int(resolution_ms * 1e6) - 1)
+    return np.maximum.accumulate(aligned)
+
+
+def resample_events(events: np.ndarray, start_ns: int, rate: float, end_ms: float | None = None) -> np.ndarray:
+    """
+    Resamples tablet events onto the fixed-rate sample times of a trial by linear interpolation.
+
+    The samples are taken at every multiple of the period after `start_ns`, like the sampler's
+    ticks, from the first to the last event, and up to `end_ms` if given. Positions, pressure,
+    tilts and rotation are interpolated between the events around each sample time instead of
+    holding the last event, and the tablet time is that of the last event before the sample.
+
+    Args:
+        events (np.ndarray): Raw events (`RAW_EVENT_DTYPE`) in window pixels, in arrival order.
+        start_ns (int): Start of the trial, in perf counter ns.
+        rate (float): Sample rate in Hz.
+        end_ms (float | None): Time of the last sample to produce, in ms since the start.
+
+    Returns:
+        np.ndarray: The samples (`SAMPLE_DTYPE`) with the time in ms since the start.
+    """
+    event_times = (align_event_times(events['event_ms'], events['arrival_ns']) - start_ns) / 1e6
+    if len(event_times) < 2:
+        return np.empty(0, dtype=SAMPLE_DTYPE)
+    period_ms = 1000 / rate
+    last_ms = event_times[-1] if end_ms is None else min(event_times[-1], end_ms)
+    first_tick = max(int(np.ceil(event_times[0] / period_ms)), 1)
+    times = np.arange(first_tick, int(last_ms / period_ms) + 1) * period_ms
+
+    samples = np.empty(len(times), dtype=SAMPLE_DTYPE)
+    for name in INTERPOLATED_FIELDS:
+        samples[name] = np.interp(times, event_times, events[name])
+    previous = np.clip(np.searchsorted(event_times, times, side='right') - 1, 0, len(events) - 1)
+    samples['tablet_time'] = events['event_ms'][previous]
+    samples['time'] = times
+    return samples
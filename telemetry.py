@@ -0,0 +1,111 @@
+import json
+from pathlib import Path
+
+SUB_BUCKET_BITS = 3                                 # 8 buckets per power of two, at most 12.5% wide
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+LINEAR_LIMIT = 2 * SUB_BUCKETS                      # values below this get a bucket each
+NUM_BUCKETS = LINEAR_LIMIT + 60 * SUB_BUCKETS
+
+
+def _bucket_index(value: int) -> int:
+    if value < LINEAR_LIMIT:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return LINEAR_LIMIT + (shift - 1) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS
+
+
+def _bucket_upper_bound(index: int) -> int:
+    if index < LINEAR_LIMIT:
+        return index
+    shift, sub_bucket = divmod(index - LINEAR_LIMIT, SUB_BUCKETS)
+    return ((SUB_BUCKETS + sub_bucket + 1) << (shift + 1)) - 1
+
+
+class Histogram:
+    def __init__(self):
+        """
+        A histogram of non-negative integer values with log-linear buckets.
+
+        Each power of two is split into `SUB_BUCKETS` equal buckets, so a recorded value is known
+        to within 12.5% while recording stays a few integer operations and memory stays fixed
+        however many values are recorded.
+        """
+        self.buckets = [0] * NUM_BUCKETS
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def record(self, value: int) -> None:
+        value = max(int(value), 0)
+        self.buckets[min(_bucket_index(value), NUM_BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, fraction: float) -> int | None:
+        """Returns the upper bound of the bucket holding the given fraction of the values."""
+        if not self.count:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for index, bucket in enumerate(self.buckets):
+            seen += bucket
+            if seen >= target:
+                return min(_bucket_upper_bound(index), self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else None,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.percentile(0.5),
+            'p99': self.percentile(0.99),
+            # Upper bound of each non-empty bucket -> number of values
+            'buckets': {_bucket_upper_bound(index): bucket for index, bucket in enumerate(self.buckets) if bucket},
+        }
+
+
+class TrialTelemetry:
+    def __init__(self):
+        """
+        Timings of one trial, recorded into histograms and saved as a sidecar of the trial file.
+
+        Callers keep a `TrialTelemetry` or None and only measure when it is not None, so a
+        disabled telemetry costs one check per measuring point.
+        """
+        self.histograms: dict[str, Histogram] = {}
+        self.counters: dict[str, int] = {}
+        self._last_ticks: dict[str, int] = {}
+
+    def record(self, name: str, value: int) -> None:
+        """Records a value, e.g. a duration in ns, into the histogram `name`."""
+        if (histogram := self.histograms.get(name)) is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.record(value)
+
+    def tick(self, name: str, now_ns: int) -> None:
+        """Records the time since the previous tick of `name` into its histogram."""
+        last = self._last_ticks.get(name)
+        self._last_ticks[name] = now_ns
+        if last is not None:
+            self.record(name, now_ns - last)
+
+    def count(self, name: str, value: int) -> None:
+        """Sets a counter, e.g. the number of samples taken."""
+        self.counters[name] = value
+
+    def save(self, path: Path, **info) -> None:
+        """Writes the histograms, the counters and any extra information to a JSON file."""
+        telemetry = {
+            **info,
+            'counters': self.counters,
+            'histograms': {name: histogram.summary() for name, histogram in sorted(self.histograms.items())},
+        }
+        with Path(path).open(mode="w") as file:
+            json.dump(telemetry, file, indent=4)
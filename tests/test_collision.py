@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from shapes import Circle, Rectangle
+from collision import CollisionEngine
+
+CELL_SIZE = 25          # pixels, small enough that most shapes span several cells
+
+
+def _layout(rng: np.random.Generator, num_circles: int, num_rects: int) -> tuple[list[Circle], list[Rectangle]]:
+    circles = [Circle(x, y, rx, ry) for x, y, rx, ry in zip(
+        rng.uniform(0, 400, num_circles), rng.uniform(0, 400, num_circles),
+        rng.uniform(2, 30, num_circles), rng.uniform(2, 30, num_circles)
+    )]
+    # Negative widths and heights put the corner on the other side, which Rectangle.check_hit never matches
+    rects = [Rectangle(x, y, w, h) for x, y, w, h in zip(
+        rng.uniform(0, 400, num_rects), rng.uniform(0, 400, num_rects),
+        rng.uniform(-40, 40, num_rects), rng.uniform(-40, 40, num_rects)
+    )]
+    return circles, rects
+
+
+def _path(rng: np.random.Generator, num_samples: int) -> np.ndarray:
+    """A random walk over the layout that stays in place for some samples, like a pen at rest."""
+    steps = rng.normal(0, 8, (num_samples, 2))
+    steps[rng.random(num_samples) < 0.2] = 0
+    return rng.uniform(0, 400, 2) + np.cumsum(steps, axis=0)
+
+
+def _reference_hits(circles, rects, x, y, prev) -> tuple[np.ndarray, np.ndarray]:
+    circles_hit = [circle.check_hit(x, y) or prev is not None and bool(circle.check_hit_line_segment(x, y, *prev)) for circle in circles]
+    rects_hit = [rect.check_hit(x, y) or prev is not None and bool(rect.check_hit_line_segments(x, y, *prev)) for rect in rects]
+    return np.flatnonzero(circles_hit), np.flatnonzero(rects_hit)
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("cell_size", [None, CELL_SIZE])
+def test_hit_indices_match_shapes(seed, cell_size):
+    rng = np.random.default_rng(seed)
+    circles, rects = _layout(rng, 40, 40)
+    engine = CollisionEngine(circles, rects, cell_size)
+    prev = None
+    for x, y in _path(rng, 300).tolist():
+        expected = _reference_hits(circles, rects, x, y, prev)
+        circles_hit, rects_hit = engine.hit_indices(x, y, prev)
+        assert np.array_equal(circles_hit, expected[0])
+        assert np.array_equal(rects_hit, expected[1])
+        prev = (x, y)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_trajectory_hits_match_shapes(seed):
+    rng = np.random.default_rng(seed)
+    circles, rects = _layout(rng, 40, 40)
+    path = _path(rng, 300)
+    expected_circles = np.zeros(len(circles), dtype=bool)
+    expected_rects = np.zeros(len(rects), dtype=bool)
+    for index, (x, y) in enumerate(path.tolist()):
+        # Like Data.process_input_data, segments are only tested from the third sample
+        prev = tuple(path[index - 1].tolist()) if index >= 2 else None
+        circles_hit, rects_hit = _reference_hits(circles, rects, x, y, prev)
+        expected_circles[circles_hit] = True
+        expected_rects[rects_hit] = True
+
+    # A small chunk size also tests the segments across chunk boundaries
+    circles_hit, rects_hit = CollisionEngine(circles, rects).trajectory_hits(path[:, 0], path[:, 1], chunk_size=64)
+    assert np.array_equal(circles_hit, expected_circles)
+    assert np.array_equal(rects_hit, expected_rects)
@@ -0,0 +1,50 @@
+import numpy as np
+from results_store import BlockResultWriter, BlockResults
+from sample_buffer import SAMPLE_DTYPE
+
+
+def _samples(test_number: int) -> np.ndarray:
+    samples = np.zeros(10 * test_number, dtype=SAMPLE_DTYPE)
+    samples['x'] = test_number
+    samples['time'] = np.arange(len(samples)) * 5.0
+    return samples
+
+
+def _add_trial(writer: BlockResultWriter, test_number: int) -> None:
+    writer.add_trial(test_number, _samples(test_number), 50.0 * test_number, 1, 0, 0, 1, 1, [1, test_number % 2], [0], 0.5)
+
+
+def test_resumed_block_keeps_earlier_trials(tmp_path):
+    path = tmp_path / "1.results.npz"
+    writer = BlockResultWriter(path)
+    for test_number in (1, 2, 3):
+        _add_trial(writer, test_number)
+        writer.save_in_background()
+    writer.close()
+    assert BlockResults(path).trials['test_number'].tolist() == [1, 2, 3]
+
+    # Resumed at test 3, e.g. after a crash before its progress was saved: test 3 is run again
+    writer = BlockResultWriter(path, start_test_number=3)
+    for test_number in (3, 4):
+        _add_trial(writer, test_number)
+        writer.save_in_background()
+    writer.close()
+
+    block = BlockResults(path)
+    assert block.trials['test_number'].tolist() == [1, 2, 3, 4]
+    for index, test_number in enumerate((1, 2, 3, 4)):
+        assert np.array_equal(block.trial_samples(index), _samples(test_number))
+        assert block.trial_hits(index)[0].tolist() == [1, test_number % 2]
+
+
+def test_fresh_block_overwrites_earlier_trials(tmp_path):
+    path = tmp_path / "1.results.npz"
+    writer = BlockResultWriter(path)
+    _add_trial(writer, 1)
+    _add_trial(writer, 2)
+    writer.save()
+
+    writer = BlockResultWriter(path)
+    _add_trial(writer, 1)
+    writer.save()
+    assert BlockResults(path).trials['test_number'].tolist() == [1]
@@ -0,0 +1,62 @@
+import csv
+from pathlib import Path
+import numpy as np
+import pytest
+from config import INPUT_CIRCLES_FILE_NAME, INPUT_RECTS_FILE_NAME
+from utils import create_input_file_from_excel
+
+ROOT = Path(__file__).resolve().parent.parent
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+
+def test_input_file_matches_baseline(tmp_path):
+    # C1_1_input.csv was written by the original pandas implementation
+    output_file = tmp_path / "input.csv"
+    create_input_file_from_excel(str(ROOT / "data" / "C1" / "1"), str(output_file))
+    assert output_file.read_bytes() == (FIXTURES / "C1_1_input.csv").read_bytes()
+
+
+@pytest.mark.parametrize("block", ["C2", "P1"])
+def test_empty_workbooks_fail_like_baseline(tmp_path, block):
+    # The placeholder Excel files of these test types are empty, which the original implementation rejected too
+    with pytest.raises(ValueError, match="Excel file format cannot be determined"):
+        create_input_file_from_excel(str(ROOT / "data" / block), str(tmp_path / "input.csv"))
+
+
+def _read_input_file(path: Path) -> list[list[str]]:
+    with path.open(newline="") as file:
+        return [[field for field in row if field != ''] for row in csv.reader(file)]
+
+
+def test_input_file_compacts_mixed_shapes(tmp_path):
+    import pandas as pd
+    from benchmark import write_synthetic_excel
+
+    write_synthetic_excel(str(tmp_path), 50, np.random.default_rng(0))
+    circles = pd.read_excel(tmp_path / INPUT_CIRCLES_FILE_NAME, header=None).to_numpy().reshape(50, -1, 3)
+    rects = pd.read_excel(tmp_path / INPUT_RECTS_FILE_NAME, header=None).to_numpy().reshape(50, -1, 4)
+    # The output deliberately differs from the original loop on this workbook. That loop stepped
+    # through the circle slots with the field stride, so only the first two of four slots were
+    # checked and a removal shifted the next slot past them: empty shapes in later slots stayed in
+    # its output and were counted. As its rows then had different lengths, pandas also wrote the
+    # counts that shared a column with shape fields as floats, e.g. `3.0`. Every empty shape is left
+    # out now and the counts are integers.
+    assert (circles[:, 2:, 2] == 0).any() and ((circles[:, :, 2] != 0).sum(axis=1) > 1).any()
+    assert ((rects == 0).all(axis=-1).any(axis=1) & (rects != 0).any(axis=-1).any(axis=1)).any()
+
+    output_file = tmp_path / "input.csv"
+    create_input_file_from_excel(str(tmp_path), str(output_file))
+    rows = _read_input_file(output_file)
+
+    assert len(rows) == 50
+    for row, row_circles, row_rects in zip(rows, circles, rects):
+        kept_circles = row_circles[row_circles[:, 2] != 0]
+        kept_rects = row_rects[(row_rects != 0).any(axis=-1)]
+        # Whole-number general columns are written as integers, like the original
+        assert row[:2] == ['2000', '200']
+        rest = row[8:]
+        assert int(rest[0]) == len(kept_circles)
+        assert np.array_equal(np.array(rest[1:1 + kept_circles.size], dtype=float), kept_circles.ravel())
+        rest = rest[1 + kept_circles.size:]
+        assert int(rest[0]) == len(kept_rects)
+        assert np.array_equal(np.array(rest[1:], dtype=float), kept_rects.ravel())
@@ -0,0 +1,161 @@
+import os
+import hashlib
+import tempfile
+import numpy as np
+from config import INPUT_DATA_FILE_NAME, INPUT_CIRCLES_FILE_NAME, INPUT_RECTS_FILE_NAME, COMPILED_TRIAL_SET_FILE_NAME, GENERATED_MANIFEST_FILE_NAME
+
+CIRCLE_DATA_SIZE = 3            # x, y, r
+RECT_DATA_SIZE = 4              # x, y, w, h
+GENERAL_DATA_SIZE = 2 + 2 * CIRCLE_DATA_SIZE        # time, rate, source circle, destination circle
+SOURCE_FILE_NAMES = (INPUT_DATA_FILE_NAME, INPUT_CIRCLES_FILE_NAME, INPUT_RECTS_FILE_NAME)
+NO_SOURCES = np.empty((0, 4), dtype=str)            # source signature of generated trial sets
+
+
+class TrialSet:
+    def __init__(self, general: np.ndarray, circles: np.ndarray, circle_counts: np.ndarray, rects: np.ndarray, rect_counts: np.ndarray):
+        """
+        The trials of one block, held as dense arrays.
+
+        Args:
+            general (np.ndarray): (trials, 8) array of time, rate, source circle and destination circle.
+            circles (np.ndarray): (trials, max circles, 3) array of middle circles, empty ones removed and
+                the remaining ones moved to the front.
+            circle_counts (np.ndarray): Number of middle circles in each trial.
+            rects (np.ndarray): (trials, max rectangles, 4) array of rectangles, compacted like `circles`.
+            rect_counts (np.ndarray): Number of rectangles in each trial.
+        """
+        self.general = general
+        self.circles = circles
+        self.circle_counts = circle_counts
+        self.rects = rects
+        self.rect_counts = rect_counts
+
+    def __len__(self) -> int:
+        return len(self.general)
+
+    def trial(self, index: int) -> tuple:
+        """Returns the `Data` arguments of a trial: time, rate, source, destination, circles and rectangles."""
+        general = self.general[index].tolist()
+        time, rate = int(general[0]), int(general[1])
+        source_circle = tuple(general[2:2 + CIRCLE_DATA_SIZE])
+        dest_circle = tuple(general[2 + CIRCLE_DATA_SIZE:GENERAL_DATA_SIZE])
+        middle_circles = [tuple(circle) for circle in self.circles[index, :self.circle_counts[index]].tolist()]
+        rectangles = [tuple(rect) for rect in self.rects[index, :self.rect_counts[index]].tolist()]
+        return time, rate, source_circle, dest_circle, middle_circles, rectangles
+
+    def save(self, path: str, sources: np.ndarray) -> None:
+        """Writes the trial set and the signature of its source files to a `.npz` file."""
+        # A temporary file of its own, as another scheduler or app instance may compile the same block
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                np.savez(
+                    file, general=self.general, circles=self.circles, circle_counts=self.circle_counts,
+                    rects=self.rects, rect_counts=self.rect_counts, sources=sources
+                )
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> tuple['TrialSet', np.ndarray]:
+        """Reads a trial set and the signature of its source files from a `.npz` file."""
+        with np.load(path) as arrays:
+            trial_set = cls(arrays['general'], arrays['circles'], arrays['circle_counts'], arrays['rects'], arrays['rect_counts'])
+            return trial_set, arrays['sources']
+
+
+def _compact(shapes: np.ndarray, keep: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Moves the kept shapes of each row to the front, preserving their order, and zeroes the rest."""
+    order = np.argsort(~keep, axis=1, kind='stable')
+    compacted = np.take_along_axis(shapes, order[..., None], axis=1)
+    counts = keep.sum(axis=1)
+    compacted[np.arange(shapes.shape[1]) >= counts[:, None]] = 0
+    max_count = int(counts.max()) if len(counts) else 0
+    return compacted[:, :max_count], counts
+
+
+def read_trial_set_from_excel(directory: str) -> TrialSet:
+    """
+    Reads the general test data, circles and rectangles Excel files of a block.
+
+    The circle and rectangle sheets are reshaped into (trials, shapes, fields) arrays, and
+    circles with a zero radius and rectangles with all fields zero are masked out in one pass.
+
+    Args:
+        directory (str): Path to the directory containing the Excel files.
+    """
+    import pandas as pd
+
+    paths = [os.path.join(directory, name) for name in SOURCE_FILE_NAMES]
+    if not all(os.path.exists(path) for path in paths):
+        raise FileNotFoundError("One or more required Excel files (general_test_data.xlsx, circles.xlsx, rects.xlsx) are missing.")
+
+    general, circles, rects = (pd.read_excel(path, header=None).fillna(0).to_numpy(dtype=float) for path in paths)
+    num_trials = min(len(general), len(circles), len(rects))
+    general = general[:num_trials]
+
+    num_circles = circles.shape[1] // CIRCLE_DATA_SIZE
+    circles = circles[:num_trials, :num_circles * CIRCLE_DATA_SIZE].reshape(num_trials, num_circles, CIRCLE_DATA_SIZE)
+    circles, circle_counts = _compact(circles, circles[..., 2] != 0)
+
+    num_rects = rects.shape[1] // RECT_DATA_SIZE
+    rects = rects[:num_trials, :num_rects * RECT_DATA_SIZE].reshape(num_trials, num_rects, RECT_DATA_SIZE)
+    rects, rect_counts = _compact(rects, (rects != 0).any(axis=-1))
+
+    return TrialSet(general, circles, circle_counts, rects, rect_counts)
+
+
+def _source_signature(directory: str, with_hash: bool = True) -> np.ndarray:
+    """Returns the size, modification time and SHA-1 of each source Excel file."""
+    signature = []
+    for name in SOURCE_FILE_NAMES:
+        path = os.path.join(directory, name)
+        stat = os.stat(path)
+        digest = ''
+        if with_hash:
+            with open(path, 'rb') as file:
+                digest = hashlib.sha1(file.read()).hexdigest()
+        signature.append((name, str(stat.st_size), str(stat.st_mtime_ns), digest))
+    return np.array(signature, dtype=str)
+
+
+def compile_trial_set(directory: str) -> TrialSet:
+    """Reads the Excel files of a block and writes the compiled trial set next to them."""
+    sources = _source_signature(directory)
+    trial_set = read_trial_set_from_excel(directory)
+    trial_set.save(os.path.join(directory, COMPILED_TRIAL_SET_FILE_NAME), sources)
+    print(f"Compiled trial set created at: {os.path.join(directory, COMPILED_TRIAL_SET_FILE_NAME)}")
+    return trial_set
+
+
+def load_trial_set(directory: str) -> TrialSet:
+    """
+    Loads the compiled trial set of a block, compiling it first if it is missing or stale.
+
+    The compiled file is stale when the size or modification time of a source file changed
+    and its content hash no longer matches. Generated trial sets have no source files and are
+    never stale; a missing one is rebuilt from its manifest.
+    """
+    path = os.path.join(directory, COMPILED_TRIAL_SET_FILE_NAME)
+    if not os.path.exists(path):
+        if os.path.exists(os.path.join(directory, GENERATED_MANIFEST_FILE_NAME)):
+            from noise import regenerate_block
+
+            return regenerate_block(directory)
+        return compile_trial_set(directory)
+
+    trial_set, sources = TrialSet.load(path)
+    if not sources.size:
+        return trial_set
+    current = _source_signature(directory, with_hash=False)
+    if sources.shape == current.shape and (sources[:, :3] == current[:, :3]).all():
+        return trial_set
+
+    current = _source_signature(directory)
+    if sources.shape == current.shape and (sources[:, [0, 1, 3]] == current[:, [0, 1, 3]]).all():
+        # Only touched, remember the new modification times
+        trial_set.save(path, current)
+        return trial_set
+    return compile_trial_set(directory)